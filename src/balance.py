@@ -0,0 +1,115 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import project
+
+RECORD_FIELDS = ('set_index', 'seed', 'won', 'game_end_scenario', 'time_left', 'hits_taken', 'gksr_hitpoints', 'ticks')
+
+def _init_worker():
+    project.init_headless()
+
+def _run_job(job):
+    set_index, seed, balance, time_limit, dt = job
+    stats = project.run_headless_simulation(seed=seed, dt=dt, time_limit=time_limit, balance=balance)
+    return (set_index, seed, int(stats['winner'] == 'player'), stats['game_end_scenario'], round(stats['time_left'], 4), stats['hits_taken'], stats['gksr_hitpoints'], stats['ticks'])
+
+def generate_jobs(parameter_sets, runs_per_set=100, base_seed=0, time_limit=70.0, dt=project.SIMULATION_STEP):
+    for set_index, balance in enumerate(parameter_sets):
+        for run in range(0, runs_per_set, 1):
+            yield (set_index, base_seed + run, balance, time_limit, dt)
+
+def run_batch(parameter_sets, runs_per_set=100, processes=None, base_seed=0, time_limit=70.0, dt=project.SIMULATION_STEP, chunksize=4):
+    jobs = generate_jobs(parameter_sets, runs_per_set, base_seed, time_limit, dt)
+    pool = multiprocessing.Pool(processes, initializer=_init_worker)
+    try:
+        for record in pool.imap_unordered(_run_job, jobs, chunksize):
+            yield record
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+def summarize(records, parameter_sets, time_limit=70.0, bins=14):
+    grouped = [[] for balance in parameter_sets]
+    for record in records:
+        grouped[record[0]].append(record)
+
+    summaries = []
+    for set_index, set_records in enumerate(grouped):
+        won = np.array([record[2] for record in set_records], dtype=bool)
+        time_left = np.array([record[4] for record in set_records], dtype=np.float64)
+        hits_taken = np.array([record[5] for record in set_records], dtype=np.float64)
+        time_to_kill = time_limit - time_left[won]
+
+        summary = {
+            'set_index': set_index,
+            'parameters': parameter_sets[set_index],
+            'runs': len(set_records),
+            'win_rate': float(won.mean()) if len(set_records) > 0 else 0.0,
+            'mean_hits_taken': float(hits_taken.mean()) if len(set_records) > 0 else 0.0,
+            'end_scenarios': {str(code): sum(1 for record in set_records if record[3] == code) for code in (1, 2, 3)},
+            'time_to_kill': None,
+        }
+        if len(time_to_kill) > 0:
+            counts, edges = np.histogram(time_to_kill, bins=bins, range=(0, time_limit))
+            summary['time_to_kill'] = {
+                'mean': float(time_to_kill.mean()),
+                'p10': float(np.percentile(time_to_kill, 10)),
+                'p50': float(np.percentile(time_to_kill, 50)),
+                'p90': float(np.percentile(time_to_kill, 90)),
+                'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+            }
+        summaries.append(summary)
+    return summaries
+
+def load_parameter_sets(path=None):
+    if path is None:
+        return [{}]
+    with open(path) as file:
+        parameter_sets = json.load(file)
+    for balance in parameter_sets:
+        project.merge_balance(balance)
+    return parameter_sets
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run seeded headless boss fights in parallel and summarize balance.')
+    parser.add_argument('--params', help='JSON file with a list of balance overrides, one per parameter set')
+    parser.add_argument('--runs', type=int, default=100, help='simulations per parameter set')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first run in every set')
+    parser.add_argument('--records', help='stream one JSON record per finished run to this file')
+    parser.add_argument('--output', help='write the summary to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    parameter_sets = load_parameter_sets(args.params)
+
+    records = []
+    record_file = open(args.records, 'w') if args.records else None
+    if record_file is not None:
+        record_file.write(json.dumps(RECORD_FIELDS) + '\n')
+    try:
+        for record in run_batch(parameter_sets, args.runs, args.processes, args.seed):
+            records.append(record)
+            if record_file is not None:
+                record_file.write(json.dumps(record) + '\n')
+    finally:
+        if record_file is not None:
+            record_file.close()
+
+    summaries = summarize(records, parameter_sets)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(summaries, file, indent=2)
+    else:
+        json.dump(summaries, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+import pygame
+
+import project
+import vector_env
+
+PROJECTILE_SCENES = (10, 100, 1000, 10000)
+POWERUP_SCENES = (10, 100, 1000)
+BLAST_SCENES = (10, 100, 1000)
+STAR_SCENES = (300, 5000, 50000)
+SPRITE_SCENES = (10, 100, 1000)
+ORIGIN_SCENES = (8, 64, 512)
+MEMORY_SCENES = (100, 1000)
+VECTOR_ENV_SCENES = (256, 4096)
+COLLISION_SCENES = (10, 100, 1000)
+COLLISION_GRID_SCENES = (1000, 10000)
+COLLISION_GRID_QUERIES = (1, 16, 64)
+REGRESSION_TOLERANCE = 0.25
+REGRESSION_MIN_MS = 0.01
+
+def _make_canvas():
+    return pygame.Surface((project.DISPLAY_WIDTH, project.DISPLAY_HEIGHT), 0, 32)
+
+def _asset_counters():
+    stats = project.ASSET_CACHE.stats()
+    return (stats['hits'] + stats['misses'], stats['disk_loads'])
+
+def _timing_result(name, size, times):
+    times_ms = np.array(times) * 1000
+    return {
+        'name': name,
+        'size': size,
+        'iterations': len(times),
+        'ms_per_call': float(np.median(times_ms)),
+        'p95_ms': float(np.percentile(times_ms, 95)),
+    }
+
+def _time_calls(call, iterations=60, prepare=None):
+    times = []
+    for iteration in range(0, iterations, 1):
+        if prepare is not None:
+            prepare()
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    return times
+
+def _make_world(stars=0, seed=0):
+    world = project.GameWorld(star_count=stars, rng=random.Random(seed))
+    world.player.active_powerup = 3
+    return world
+
+def _fill_projectiles(world, count, rng):
+    blast_details = (('images\\gksr\\phase1\\blast\\', 8, 12), (0, 0), (1, 1))
+    for projectile in range(0, count, 1):
+        position = (rng.uniform(600, 1400), rng.uniform(0, project.DISPLAY_HEIGHT))
+        world.gksr_projectiles.spawn(('images\\gksr\\phase1\\projectile\\', 3, 12), position, hb=(48, 48), s=rng.uniform(50, 150), dir=-1, dmg=1, bd=blast_details)
+
+def bench_update_projectiles(sizes=PROJECTILE_SCENES):
+    results = []
+    for size in sizes:
+        world = _make_world()
+        _fill_projectiles(world, size, random.Random(size))
+        grid = project.CollisionGrid()
+        def call():
+            grid.begin_frame()
+            project.update_projectiles(world.gksr_projectiles, world.player, world.gksr, world.blasts, 1/60, grid)
+        results.append(_timing_result('update_projectiles', size, _time_calls(call)))
+    return results
+
+def bench_collision_modes(sizes=COLLISION_SCENES):
+    results = []
+    blast_details = (('images\\player\\blast\\', 6, 12), (0, 0), (1, 1))
+    for size in sizes:
+        for mode in project.COLLISION_MODES:
+            world = _make_world()
+            world.set_collision_mode(mode)
+            rng = random.Random(size)
+            for projectile in range(0, size, 1):
+                position = (rng.uniform(1000, 1900), rng.uniform(0, project.DISPLAY_HEIGHT))
+                world.player_projectiles.spawn(('images\\player\\projectile\\', 3, 12), position, hb=(30, 30), s=900, dir=1, dmg=1, bd=blast_details)
+            grid = project.CollisionGrid()
+            def call():
+                grid.begin_frame()
+                return project.find_projectile_hits(world.player_projectiles, world.gksr, grid)
+            result = _timing_result(f'find_projectile_hits_{mode}', size, _time_calls(call))
+            result['hits'] = len(call())
+            results.append(result)
+
+            world = _make_world(300, size)
+            world.set_collision_mode(mode)
+            _fill_projectiles(world, size, random.Random(size))
+            canvas = _make_canvas()
+            def call():
+                world.step(project.dodging_bot(world), 1/60)
+                world.draw(canvas)
+            results.append(_timing_result(f'full_frame_{mode}', size, _time_calls(call)))
+    return results
+
+def bench_collision_grid(sizes=COLLISION_GRID_SCENES, query_counts=COLLISION_GRID_QUERIES):
+    results = []
+    for size in sizes:
+        rng = np.random.default_rng(size)
+        left = rng.uniform(0, project.DISPLAY_WIDTH, size)
+        top = rng.uniform(0, project.DISPLAY_HEIGHT, size)
+        handles = np.arange(size)
+        for count in query_counts:
+            rects = [pygame.Rect(int(x), int(y), 60, 60) for x, y in zip(rng.uniform(0, project.DISPLAY_WIDTH, count), rng.uniform(0, project.DISPLAY_HEIGHT, count))]
+            for mode, min_queries in (('scan', float('inf')), ('sorted', 0)):
+                grid = project.CollisionGrid(me=0, mq=min_queries)
+                def call():
+                    grid.begin_frame()
+                    grid.register_bounds(handles, handles, left, top, left + 48, top + 48)
+                    for rect in rects:
+                        grid.query(handles, rect)
+                results.append(dict(_timing_result(f'collision_grid_{mode}_{count}q', size, _time_calls(call)), queries=count))
+    return results
+
+def bench_update_powerups(sizes=POWERUP_SCENES):
+    results = []
+    for size in sizes:
+        world = _make_world()
+        rng = random.Random(size)
+        world.powerups = [project.spawn_powerup((rng.uniform(600, 1400), rng.uniform(0, project.DISPLAY_HEIGHT)), rng) for powerup in range(0, size, 1)]
+        grid = project.CollisionGrid()
+        def call():
+            grid.begin_frame()
+            project.update_powerups(world.powerups, world.player, 1/60, grid)
+        results.append(_timing_result('update_powerups', size, _time_calls(call)))
+    return results
+
+def bench_update_blasts(sizes=BLAST_SCENES):
+    results = []
+    for size in sizes:
+        rng = random.Random(size)
+        blasts = [project.Blast(('images\\gksr\\phase1\\blast\\', 8, 12), (rng.uniform(0, project.DISPLAY_WIDTH), rng.uniform(0, project.DISPLAY_HEIGHT)), (1, 1)) for blast in range(0, size, 1)]
+        scene = []
+        def prepare():
+            for blast in blasts:
+                blast.lifetime = 0
+            scene[:] = blasts
+        results.append(_timing_result('update_blasts', size, _time_calls(lambda: project.update_blasts(scene, 1/60), prepare=prepare)))
+    return results
+
+def bench_update_stars(sizes=STAR_SCENES):
+    results = []
+    canvas = _make_canvas()
+    for size in sizes:
+        stars = project.StarField(size, seed=size)
+        results.append(_timing_result('update_stars', size, _time_calls(lambda: project.update_stars(stars, 1/60))))
+        results.append(_timing_result('draw_stars', size, _time_calls(lambda: stars.draw(canvas))))
+    return results
+
+def bench_gksr_fire_projectile_wave():
+    world = _make_world()
+    rng = random.Random(0)
+    def prepare():
+        world.gksr_projectiles.clear()
+        world.powerups.clear()
+        world.gksr.attack_queue.clear()
+    call = lambda: project.gksr_fire_projectile_wave(world.gksr, world.powerups, world.gksr_projectiles, rng)
+    return [_timing_result('gksr_fire_projectile_wave', world.gksr.projectiles_per_wave, _time_calls(call, 200, prepare))]
+
+def _rejection_sampled_origins(origins, count, rng):
+    positions = []
+    while len(positions) < count:
+        pos = rng.choice(origins)
+        if not pos in positions:
+            positions.append(pos)
+    return positions
+
+def bench_origin_sampling(sizes=ORIGIN_SCENES):
+    results = []
+    for size in sizes:
+        gksr = project.GiantKillerSpaceRobot(po=size)
+        rng = random.Random(size)
+        call = lambda: project.choose_gksr_projectile_origins(gksr, size, rng)
+        results.append(_timing_result('choose_gksr_projectile_origins', size, _time_calls(call, 200)))
+        call = lambda: _rejection_sampled_origins(gksr.projectile_origin_positions, size, rng)
+        results.append(_timing_result('rejection_sampled_origins', size, _time_calls(call, 200)))
+    return results
+
+def bench_animated_sprite_construction(sizes=SPRITE_SCENES):
+    results = []
+    for size in sizes:
+        def call():
+            for sprite in range(0, size, 1):
+                project.AnimatedSprite('images\\gksr\\phase1\\projectile\\', (0, 0), 3, 12)
+        results.append(_timing_result('animated_sprite_construction', size, _time_calls(call, 20)))
+    return results
+
+def bench_full_frame(sizes=PROJECTILE_SCENES, stars=300):
+    results = []
+    canvas = _make_canvas()
+    for size in sizes:
+        world = _make_world(stars, size)
+        _fill_projectiles(world, size, random.Random(size))
+        def call():
+            world.step(project.dodging_bot(world), 1/60)
+            world.draw(canvas)
+        results.append(_timing_result('full_frame', size, _time_calls(call)))
+    return results
+
+def bench_full_frame_stars(sizes=STAR_SCENES, projectiles=100):
+    return [dict(bench_full_frame((projectiles,), stars)[0], name='full_frame_stars', size=stars) for stars in sizes]
+
+def _io_result(name, frames, elapsed, counters_before):
+    lookups_before, loads_before = counters_before
+    lookups_after, loads_after = _asset_counters()
+    return {
+        'name': name,
+        'frames': frames,
+        'ms_per_frame': (elapsed / frames) * 1000,
+        'asset_lookups_per_frame': (lookups_after - lookups_before) / frames,
+        'disk_loads_per_frame': (loads_after - loads_before) / frames,
+    }
+
+def bench_preload(workers=(1, project.PRELOAD_WORKERS)):
+    results = []
+    for count in workers:
+        preloader = project.AssetPreloader(cache=project.AssetCache(cap=float('inf')), workers=count)
+        start = time.perf_counter()
+        preloader.start()
+        preloader.wait()
+        elapsed = time.perf_counter() - start
+
+        stats = preloader.stats()
+        results.append({
+            'name': 'preload',
+            'size': count,
+            'assets': stats['loaded'],
+            'wall_ms': elapsed * 1000,
+            'decode_ms': stats['decode_ms'],
+            'finalize_ms': stats['finalize_ms'],
+            'slowest': [path for path, timing in stats['slowest']],
+        })
+    return results
+
+def bench_end_screen_io(frames=600):
+    canvas = _make_canvas()
+    renderer = project.DirtyRectRenderer(canvas)
+    end_screens = project.load_end_screens()
+    renderer.set_background(drawables=(end_screens[1],))
+
+    counters_before = _asset_counters()
+    start = time.perf_counter()
+    for frame in range(0, frames, 1):
+        renderer.begin_frame()
+        renderer.present([])
+    return _io_result('end_screen_io', frames, time.perf_counter() - start, counters_before)
+
+def bench_powerup_indicator_io(frames=600):
+    canvas = _make_canvas()
+    world = project.GameWorld(star_count=0, rng=random.Random(0))
+    world.player.active_powerup = 2
+
+    counters_before = _asset_counters()
+    start = time.perf_counter()
+    for frame in range(0, frames, 1):
+        world.draw(canvas)
+    return _io_result('powerup_indicator_io', frames, time.perf_counter() - start, counters_before)
+
+class _PerInstanceAnimation():
+    def __init__(self, images, fps=12):
+        self.images = images
+        self.image_index = 0
+        self.image = images[0]
+        self.image_replace_time = 1.0 / fps
+        self.time_since_last_replace = 0
+
+    def update(self, dt=0):
+        self.time_since_last_replace += dt
+        if self.time_since_last_replace >= self.image_replace_time:
+            self.image_index += 1
+            self.time_since_last_replace = 0
+        if self.image_index == len(self.images):
+            self.image_index = 0
+        self.image = self.images[self.image_index]
+
+def bench_animation(entities=5000, frames=120, dt=1/60):
+    rng = random.Random(0)
+    animations = [(path, fc) for path, fc in project.group_assets(project.find_preloadable_assets())[1].items() if fc == 3]
+    details = [animations[rng.randrange(len(animations))] for entity in range(0, entities, 1)]
+
+    clock = project.AnimationClock()
+    sprites = [project.AnimatedSprite(path, (0, 0), fc, 12, clock=clock) for path, fc in details]
+    start = time.perf_counter()
+    for frame in range(0, frames, 1):
+        clock.advance(dt)
+        images = [sprite.image for sprite in sprites]
+    shared_clock_time = time.perf_counter() - start
+
+    timers = [_PerInstanceAnimation(project.ASSET_CACHE.get_frames(path, fc)) for path, fc in details]
+    start = time.perf_counter()
+    for frame in range(0, frames, 1):
+        for timer in timers:
+            timer.update(dt)
+        images = [timer.image for timer in timers]
+    per_instance_time = time.perf_counter() - start
+
+    pool = project.ProjectilePool(cap=entities, clock=clock)
+    for path, fc in details:
+        pool.spawn((path, fc, 12), (rng.uniform(0, project.DISPLAY_WIDTH), rng.uniform(0, project.DISPLAY_HEIGHT)), (30, 30), 0, 0)
+    start = time.perf_counter()
+    for frame in range(0, frames, 1):
+        clock.advance(dt)
+        pool.update(dt)
+        images = pool._current_images()
+    pool_time = time.perf_counter() - start
+
+    return {
+        'name': 'animation',
+        'entities': entities,
+        'frames': frames,
+        'shared_clock_ms_per_frame': (shared_clock_time / frames) * 1000,
+        'per_instance_timer_ms_per_frame': (per_instance_time / frames) * 1000,
+        'pool_update_ms_per_frame': (pool_time / frames) * 1000,
+    }
+
+def bench_memory(sizes=MEMORY_SCENES):
+    results = []
+    for size in sizes:
+        world = _make_world(size, size)
+        rng = random.Random(size)
+        _fill_projectiles(world, size, rng)
+        for entity in range(0, size, 1):
+            position = (rng.uniform(0, project.DISPLAY_WIDTH), rng.uniform(0, project.DISPLAY_HEIGHT))
+            world.powerups.append(project.spawn_powerup(position, rng))
+            world.blasts.append(project.Blast(('images\\gksr\\phase1\\blast\\', 8, 12), position, (1, 1)))
+        
+        report = project.memory_report(world)
+        for name, entity in report['entities'].items():
+            results.append({'name': f'memory_{name}', 'size': size, 'count': entity['count'], 'bytes_per_entity': entity['bytes_per_entity'], 'bytes': entity['bytes']})
+        results.append(dict(report['surfaces'], name='memory_surfaces', size=size))
+    return results
+
+def bench_vector_env(sizes=VECTOR_ENV_SCENES, steps=300):
+    results = []
+    for size in sizes:
+        result = vector_env.measure_throughput(size, steps)
+        results.append({
+            'name': 'vector_env',
+            'size': size,
+            'ms_per_step': (result['seconds'] / steps) * 1000,
+            'env_steps_per_second': result['env_steps_per_second'],
+        })
+    return results
+
+BENCHMARKS = {
+    'update_projectiles': bench_update_projectiles,
+    'collision_modes': bench_collision_modes,
+    'collision_grid': bench_collision_grid,
+    'update_powerups': bench_update_powerups,
+    'update_blasts': bench_update_blasts,
+    'update_stars': bench_update_stars,
+    'gksr_fire_projectile_wave': bench_gksr_fire_projectile_wave,
+    'origin_sampling': bench_origin_sampling,
+    'animated_sprite_construction': bench_animated_sprite_construction,
+    'full_frame': bench_full_frame,
+    'full_frame_stars': bench_full_frame_stars,
+    'animation': bench_animation,
+    'preload': bench_preload,
+    'end_screen_io': bench_end_screen_io,
+    'powerup_indicator_io': bench_powerup_indicator_io,
+    'memory': bench_memory,
+    'vector_env': bench_vector_env,
+}
+
+def _result_key(result):
+    return (result['name'], result.get('size'))
+
+def compare_to_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    baseline_results = {_result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        reference = baseline_results.get(_result_key(result))
+        if reference is None:
+            continue
+        for metric, value in result.items():
+            if ('ms_per' not in metric and 'bytes_per' not in metric) or metric not in reference or reference[metric] <= 0:
+                continue
+            unit = 'ms' if 'ms_per' in metric else 'bytes'
+            if value > reference[metric] * (1 + tolerance) and (unit == 'bytes' or value - reference[metric] > REGRESSION_MIN_MS):
+                regressions.append(f"{result['name']}[{result.get('size')}] {metric}: {value:.3f} {unit} vs baseline {reference[metric]:.3f} {unit} (+{(value / reference[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+def find_regressions(results):
+    regressions = []
+    for result in results:
+        if 'asset_lookups_per_frame' not in result:
+            continue
+        if result['disk_loads_per_frame'] > 0 or result['asset_lookups_per_frame'] > 0:
+            regressions.append(f"{result['name']}: per-frame asset access is back ({result['asset_lookups_per_frame']:.2f} lookups, {result['disk_loads_per_frame']:.2f} disk loads per frame)")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run headless performance benchmarks.')
+    parser.add_argument('names', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--output', help='write results as JSON to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON results from an earlier run to compare timings against')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE, help='allowed slowdown against the baseline before flagging a regression (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    project.init_headless()
+
+    results = []
+    for name in (args.names or BENCHMARKS):
+        result = BENCHMARKS[name]()
+        results += result if isinstance(result, list) else [result]
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    regressions = find_regressions(results)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions += compare_to_baseline(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pygame
+
+import project
+
+def find_images():
+    return project.find_preloadable_assets((('images', '.png'),))
+
+def pack_shelves(sizes, sheet_size=project.ATLAS_SHEET_SIZE):
+    placements = {}
+    sheets = []
+    sheet_index, x, y, shelf_height = (-1, 0, 0, 0)
+    for key in sorted(sizes, key=lambda key: (-sizes[key][1], -sizes[key][0], key)):
+        w, h = sizes[key]
+        if sheet_index >= 0 and x + w > sheet_size:
+            x, y, shelf_height = (0, y + shelf_height, 0)
+        if sheet_index < 0 or y + h > max(sheet_size, h):
+            sheets.append([0, 0])
+            sheet_index, x, y, shelf_height = (len(sheets) - 1, 0, 0, 0)
+
+        placements[key] = [sheet_index, x, y, w, h]
+        sheets[sheet_index][0] = max(sheets[sheet_index][0], x + w)
+        sheets[sheet_index][1] = max(sheets[sheet_index][1], y + h)
+        x += w
+        shelf_height = max(shelf_height, h)
+    return (placements, sheets)
+
+def build_atlas(directory=project.ATLAS_DIRECTORY, sheet_size=project.ATLAS_SHEET_SIZE):
+    cache = project.AssetCache(cap=float('inf'))
+    paths = find_images()
+    images, animations = project.group_assets(paths)
+
+    surfaces = {path: cache.get_image(path) for path in paths}
+    placements, sheet_sizes = pack_shelves({path: img.get_size() for path, img in surfaces.items()}, sheet_size)
+
+    pixels = [np.zeros((h, w, 4), dtype=np.uint8) for w, h in sheet_sizes]
+    for path, (sheet, x, y, w, h) in placements.items():
+        pixels[sheet][y:y+h, x:x+w] = np.frombuffer(pygame.image.tobytes(surfaces[path], 'BGRA'), dtype=np.uint8).reshape((h, w, 4))
+
+    output = project.resolve_asset_path(directory)
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+
+    sheets = []
+    for sheet, (w, h) in enumerate(sheet_sizes):
+        name = f'sheet{sheet}.bgra'
+        pixels[sheet].tofile(os.path.join(output, name))
+        sheets.append([name, [w, h]])
+
+    index = {
+        'version': project.ATLAS_VERSION,
+        'scale': project.UNIVERSAL_SPRITE_SCALE * project.RENDER_SCALE,
+        'sheets': sheets,
+        'images': {path: placements[path] for path in images},
+        'animations': {path: [placements[f'{path}{num}.png'] for num in range(0, fc, 1)] for path, fc in animations.items()},
+    }
+    with open(os.path.join(output, project.ATLAS_INDEX_NAME), 'w') as file:
+        json.dump(index, file, separators=(',', ':'))
+    return index
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pack every sprite, pre-scaled, into raw texture atlas sheets.')
+    parser.add_argument('--output', default=project.ATLAS_DIRECTORY, help='directory to write the sheets and index to')
+    parser.add_argument('--sheet-size', type=int, default=project.ATLAS_SHEET_SIZE, help='maximum sheet width and height in pixels')
+    parser.add_argument('--render-divisor', type=int, default=1, help='build for the game running with the same --render-divisor')
+    args = parser.parse_args(argv)
+    project.configure_render_scale(args.render_divisor)
+
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    index = build_atlas(args.output, args.sheet_size)
+    print(f"packed {len(index['images'])} images and {len(index['animations'])} animations into {len(index['sheets'])} sheets")
+
+if __name__ == '__main__':
+    main()
@@ -1,81 +1,702 @@
+import argparse
+import gc
+import hashlib
+import heapq
+import json
+import math
+import mmap
+import os
+import sys
+import numpy as np
 import pygame
 import random
+import re
+import struct
+import time
+import tracemalloc
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 DISPLAY_WIDTH, DISPLAY_HEIGHT = (1920, 1080)
 UNIVERSAL_SPRITE_SCALE = 3.0
+RENDER_SCALE = 1.0
+BACKGROUND_COLOR = pygame.Color(32, 0, 54)
+
+GKSR_ATTACK_PHASES = {
+    1: {'health_percent': 1.0, 'projectiles_per_wave': 5, 'cooldown_time': 2.0, 'powerup_drop_chance': 40, 'patterns': ['volley']},
+    2: {'health_percent': 0.66, 'projectiles_per_wave': 6, 'cooldown_time': 1.5, 'powerup_drop_chance': 30, 'patterns': ['volley']},
+    3: {'health_percent': 0.33, 'projectiles_per_wave': 7, 'cooldown_time': 1.0, 'powerup_drop_chance': 20, 'patterns': ['volley']},
+}
+GKSR_PROJECTILE_TYPES = {
+    'standard': {'hb': (48, 48), 'dmg': 1},
+    'small': {'hb': (32, 32), 'dmg': 1},
+}
+GKSR_ATTACK_PATTERNS = {
+    'volley': {'delay_step': 0.0, 'speed': 750, 'speed_step': 0, 'type': 'standard', 'order': 'random'},
+    'sweep': {'delay_step': 0.12, 'speed': 700, 'speed_step': 0, 'type': 'standard', 'order': 'sorted'},
+    'stream': {'delay_step': 0.08, 'speed': 600, 'speed_step': 75, 'type': 'small', 'order': 'random'},
+}
+
+DEFAULT_BALANCE = {
+    'player_hitpoints': 5,
+    'player_speed': 300,
+    'player_shoot_cooldown_time': 0.5,
+    'gksr_hitpoints': 140,
+    'gksr_attack_phases': GKSR_ATTACK_PHASES,
+}
+
+ASSET_CACHE_CAPACITY = 256
+PRELOAD_DIRECTORIES = (('images', '.png'), ('sounds', '.wav'))
+PRELOAD_WORKERS = 4
+PRELOAD_FRAME_BUDGET = 0.004
+
+ATLAS_DIRECTORY = 'atlas'
+ATLAS_INDEX_NAME = 'index.json'
+ATLAS_VERSION = 1
+ATLAS_SHEET_SIZE = 2048
+
+SOUND_CHANNEL_GROUPS = {'shots': 3, 'blasts': 4, 'pickups': 1}
+SOUND_EFFECTS = {
+    'player_shoot': {'path': 'sounds\\player_shoot.wav', 'volume': 0.5, 'group': 'shots', 'priority': 1},
+    'gksr_shoot': {'path': 'sounds\\gksr_shoot.wav', 'volume': 1.0, 'group': 'shots', 'priority': 2},
+    'player_blast': {'path': 'sounds\\player_blast.wav', 'volume': 0.3, 'group': 'blasts', 'priority': 1},
+    'gksr_blast': {'path': 'sounds\\gksr_blast.wav', 'volume': 1.0, 'group': 'blasts', 'priority': 2},
+    'player_pickup_powerup': {'path': 'sounds\\player_pickup_powerup.wav', 'volume': 0.5, 'group': 'pickups', 'priority': 3},
+}
+
+COLLISION_GRID_MIN_ENTRIES = 4096
+COLLISION_GRID_MIN_QUERIES = 48
+COLLISION_MODES = ('rect', 'mask')
+COLLISION_MODE = 'mask'
+COLLISION_MASK_THRESHOLD = 127
+STAR_DIRTY_RECT_LIMIT = 2000
+LAYER_HUD, LAYER_CHARACTERS, LAYER_PROJECTILES, LAYER_POWERUPS, LAYER_BLASTS = range(5)
+FULL_REDRAW_AREA_RATIO = 0.5
+
+REPLAY_MAGIC = b'IDRP'
+REPLAY_VERSION = 2
+REPLAY_HEADER = struct.Struct('<4sHIddQI')
+REPLAY_FRAME = np.dtype('u1')
+REPLAY_KEYS = (pygame.K_UP, pygame.K_DOWN, pygame.K_SPACE)
+REPLAY_CHECKPOINT_INTERVAL = 600
+
+SIMULATION_RATE = 120
+SIMULATION_STEP = 1 / SIMULATION_RATE
+MAX_CATCH_UP_STEPS = 12
+
+INPUT_KEYS = REPLAY_KEYS + (pygame.K_RSHIFT, pygame.K_BACKSPACE, pygame.K_ESCAPE)
+INPUT_LATENCY_HISTORY = 600
+BUSY_WAIT_POLL_MARGIN = 0.001
+
+PROFILER_STAGES = ('input', 'update_gksr', 'update_projectiles', 'update_powerups', 'update_blasts', 'update_stars', 'draw', 'overlay', 'present')
+PROFILER_HISTORY = 600
+PROFILER_OVERLAY_REFRESH = 15
+MEMORY_REPORT_SAMPLES = 100
+SNAPSHOT_SAVE_PATH = 'snapshot.json'
+GAME_END_WINNERS = {1: 'player', 2: 'gksr', 3: 'gksr'}
+
+def resolve_asset_path(path):
+    return path.replace('\\', os.sep)
+
+def configure_render_scale(divisor=1):
+    global RENDER_SCALE
+    RENDER_SCALE = 1.0 / divisor
+    ASSET_CACHE.clear()
+
+def render_size():
+    return (round(DISPLAY_WIDTH * RENDER_SCALE), round(DISPLAY_HEIGHT * RENDER_SCALE))
+
+def to_render_rect(rect):
+    if RENDER_SCALE == 1.0:
+        return pygame.Rect(rect)
+    return pygame.Rect(round(rect[0] * RENDER_SCALE), round(rect[1] * RENDER_SCALE), round(rect[2] * RENDER_SCALE), round(rect[3] * RENDER_SCALE))
+
+def interpolate(previous, current, alpha=1.0):
+    if alpha == 1.0:
+        return current
+    return previous + ((current - previous) * alpha)
+
+def to_world_size(size):
+    if RENDER_SCALE == 1.0:
+        return size
+    return (round(size[0] / RENDER_SCALE), round(size[1] / RENDER_SCALE))
+
+class CollisionMask():
+    __slots__ = ('width', 'height', 'mask', 'coverage')
+
+    def __init__(self, img, threshold=COLLISION_MASK_THRESHOLD):
+        opaque = pygame.mask.from_surface(img, threshold)
+        self.width, self.height = opaque.get_size()
+        self.mask = opaque
+
+        pixels = pygame.surfarray.array_red(opaque.to_surface()) > 0
+        self.coverage = np.zeros((self.width + 1, self.height + 1), dtype=np.int32)
+        self.coverage[1:, 1:] = pixels.cumsum(axis=0).cumsum(axis=1)
+
+    def count(self, left, top, right, bottom):
+        left = np.clip(np.floor(left), 0, self.width).astype(np.intp)
+        top = np.clip(np.floor(top), 0, self.height).astype(np.intp)
+        right = np.clip(np.ceil(right), 0, self.width).astype(np.intp)
+        bottom = np.clip(np.ceil(bottom), 0, self.height).astype(np.intp)
+        coverage = self.coverage
+        return coverage[right, bottom] - coverage[left, bottom] - coverage[right, top] + coverage[left, top]
+
+class AssetCache():
+    def __init__(self, cap=ASSET_CACHE_CAPACITY):
+        self.capacity = cap
+        self.entries = OrderedDict()
+        self.pinned_keys = set()
+
+        self.sealed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_loads = 0
+        self.sealed_disk_loads = 0
+        self.evictions = 0
+
+    def record_disk_load(self, path):
+        self.disk_loads += 1
+        if self.sealed:
+            self.sealed_disk_loads += 1
+            warnings.warn(f'{path} was loaded from disk after preloading finished')
+
+    def _scale_image(self, img):
+        img = img.convert_alpha()
+        scale = UNIVERSAL_SPRITE_SCALE * RENDER_SCALE
+        if scale == 1.0:
+            return img
+        return pygame.transform.scale_by(img, (scale, scale))
+
+    def _load_scaled_image(self, path):
+        self.record_disk_load(path)
+        return self._scale_image(pygame.image.load(resolve_asset_path(path)))
+
+    def _lookup(self, key):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def _store(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        self._evict_least_recently_used()
+        return value
+
+    def _evict_least_recently_used(self):
+        while len(self.entries) > self.capacity:
+            evicted = False
+            for key in self.entries:
+                if key not in self.pinned_keys:
+                    del self.entries[key]
+                    self.evictions += 1
+                    evicted = True
+                    break
+            if not evicted:
+                return
+
+    def get_image(self, path):
+        key = ('image', path)
+        img = self._lookup(key)
+        if img is None:
+            img = self._store(key, self._load_scaled_image(path))
+        return img
+
+    def get_sound(self, path):
+        key = ('sound', path)
+        sound = self._lookup(key)
+        if sound is None:
+            self.record_disk_load(path)
+            sound = self._store(key, pygame.mixer.Sound(resolve_asset_path(path)))
+        return sound
+
+    def add_image(self, path, img, pin=True):
+        key = ('image', path)
+        if key not in self.entries:
+            self._store(key, self._scale_image(img))
+        if pin:
+            self.pinned_keys.add(key)
+
+    def add_sound(self, path, sound, pin=True):
+        key = ('sound', path)
+        if key not in self.entries:
+            self._store(key, sound)
+        if pin:
+            self.pinned_keys.add(key)
+
+    def has_asset(self, path):
+        return ('image', path) in self.entries or ('sound', path) in self.entries
+
+    def _map_atlas_sheet(self, path, size):
+        self.record_disk_load(path)
+        with open(resolve_asset_path(path), 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+        return pygame.image.frombuffer(buffer, size, 'BGRA')
+
+    def _add_atlas_image(self, path, sheets, rect, pin=True):
+        key = ('image', path)
+        img = self._store(key, sheets[rect[0]].subsurface(rect[1:]))
+        if pin:
+            self.pinned_keys.add(key)
+        return img
+
+    def load_atlas(self, directory=ATLAS_DIRECTORY, pin=True):
+        index_path = f'{directory}\\{ATLAS_INDEX_NAME}'
+        if not os.path.exists(resolve_asset_path(index_path)):
+            return False
+
+        self.record_disk_load(index_path)
+        with open(resolve_asset_path(index_path)) as file:
+            index = json.load(file)
+        if index['version'] != ATLAS_VERSION or index['scale'] != UNIVERSAL_SPRITE_SCALE * RENDER_SCALE:
+            warnings.warn(f'{index_path} was built for a different format or scale, loading individual images instead')
+            return False
+
+        sheets = [self._map_atlas_sheet(f'{directory}\\{name}', size) for name, size in index['sheets']]
+        for path, rect in index['images'].items():
+            self._add_atlas_image(path, sheets, rect, pin)
+        
+        for path, rects in index['animations'].items():
+            key = ('frames', path, len(rects))
+            self._store(key, tuple(self._add_atlas_image(f'{path}{num}.png', sheets, rect, pin) for num, rect in enumerate(rects)))
+            if pin:
+                self.pinned_keys.add(key)
+        return True
+
+    def seal(self):
+        self.sealed = True
+
+    def get_frames(self, path, fc=3):
+        key = ('frames', path, fc)
+        frames = self._lookup(key)
+        if frames is None:
+            frames = tuple(self.get_image(f'{path}{num}.png') for num in range(0, fc, 1))
+            self._store(key, frames)
+        return frames
+
+    def get_sprite_descriptor(self, path, fc=3, fps=12):
+        key = ('descriptor', path, fc, fps)
+        descriptor = self._lookup(key)
+        if descriptor is None:
+            descriptor = self._store(key, SpriteDescriptor(path, fc, fps))
+        return descriptor
+
+    def get_frame_masks(self, path, fc=3):
+        key = ('masks', path, fc)
+        masks = self._lookup(key)
+        if masks is None:
+            masks = self._store(key, tuple(CollisionMask(img) for img in self.get_frames(path, fc)))
+            self.pinned_keys.add(key)
+        return masks
+
+    def clear(self):
+        self.entries.clear()
+        self.pinned_keys.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_loads': self.disk_loads,
+            'sealed_disk_loads': self.sealed_disk_loads,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+        }
+
+ASSET_CACHE = AssetCache()
+
+def find_preloadable_assets(directories=PRELOAD_DIRECTORIES):
+    paths = []
+    for directory, extension in directories:
+        for root, dirs, files in os.walk(resolve_asset_path(directory)):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(extension):
+                    paths.append('\\'.join(os.path.normpath(os.path.join(root, name)).split(os.sep)))
+    return paths
+
+def group_assets(paths):
+    frame_numbers = {}
+    for path in paths:
+        directory, name = path.rsplit('\\', 1)
+        match = re.fullmatch(r'(\d+)\.png', name)
+        if match is not None:
+            frame_numbers.setdefault(directory + '\\', []).append(int(match.group(1)))
+
+    animations = {}
+    for directory, numbers in frame_numbers.items():
+        if sorted(numbers) == list(range(0, len(numbers), 1)):
+            animations[directory] = len(numbers)
+
+    images = [path for path in paths if path.endswith('.png') and path.rsplit('\\', 1)[0] + '\\' not in animations]
+    return (images, animations)
+
+class AssetPreloader():
+    def __init__(self, paths=None, cache=ASSET_CACHE, workers=PRELOAD_WORKERS):
+        paths = paths if paths is not None else find_preloadable_assets()
+        self.animations = group_assets(paths)[1]
+        self.paths = [path for path in paths if not cache.has_asset(path)]
+        self.cache = cache
+        self.workers = workers
+        self.executor = None
+        self.pending = []
+
+        self.loaded_count = 0
+        self.timings = {}
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = [self.executor.submit(self._decode, path) for path in self.paths]
+
+    def _decode(self, path):
+        start = time.perf_counter()
+        if path.endswith('.wav'):
+            asset = pygame.mixer.Sound(resolve_asset_path(path))
+        else:
+            asset = pygame.image.load(resolve_asset_path(path))
+        return (path, asset, time.perf_counter() - start)
+
+    def _finalize(self, path, asset, decode_time):
+        start = time.perf_counter()
+        if path.endswith('.wav'):
+            self.cache.add_sound(path, asset)
+        else:
+            self.cache.add_image(path, asset)
+        self.cache.record_disk_load(path)
+
+        self.timings[path] = {'decode_ms': decode_time * 1000, 'finalize_ms': (time.perf_counter() - start) * 1000}
+        self.loaded_count += 1
+
+    def _finish(self):
+        self.executor.shutdown(wait=False)
+        for path, fc in self.animations.items():
+            self.cache.get_frames(path, fc)
+            self.cache.pinned_keys.add(('frames', path, fc))
+        self.cache.seal()
+
+    def is_done(self):
+        return self.executor is not None and len(self.pending) == 0
+
+    def poll(self, budget=PRELOAD_FRAME_BUDGET):
+        start = time.perf_counter()
+        still_pending = []
+        for future in self.pending:
+            if future.done() and time.perf_counter() - start < budget:
+                self._finalize(*future.result())
+            else:
+                still_pending.append(future)
+        self.pending = still_pending
+
+        if len(self.pending) == 0:
+            self._finish()
+        return self.is_done()
+
+    def wait(self):
+        for future in self.pending:
+            self._finalize(*future.result())
+        self.pending = []
+        self._finish()
+
+    def progress(self):
+        if len(self.paths) == 0:
+            return 1.0
+        return self.loaded_count / len(self.paths)
+
+    def stats(self, slowest=5):
+        decode_ms = sum(timing['decode_ms'] for timing in self.timings.values())
+        finalize_ms = sum(timing['finalize_ms'] for timing in self.timings.values())
+        return {
+            'loaded': self.loaded_count,
+            'decode_ms': decode_ms,
+            'finalize_ms': finalize_ms,
+            'slowest': sorted(self.timings.items(), key=lambda item: -(item[1]['decode_ms'] + item[1]['finalize_ms']))[:slowest],
+        }
+
+class SoundEffect():
+    def __init__(self, manager, name, sound, group='', priority=0):
+        self.manager = manager
+        self.name = name
+        self.sound = sound
+        self.group = group
+        self.priority = priority
+
+    def play(self):
+        self.manager.play(self)
+
+class SoundManager():
+    def __init__(self, effects=SOUND_EFFECTS, groups=SOUND_CHANNEL_GROUPS, cache=ASSET_CACHE):
+        self.effect_details = effects
+        self.group_sizes = groups
+        self.cache = cache
+
+        self.effects = {}
+        self.channels = None
+        self.pending = {}
+        self.frame = 0
+
+        self.requested = 0
+        self.merged = 0
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def get_effect(self, name):
+        if name not in self.effects:
+            details = self.effect_details[name]
+            sound = self.cache.get_sound(details['path'])
+            sound.set_volume(details['volume'])
+            self.effects[name] = SoundEffect(self, name, sound, details['group'], details['priority'])
+        return self.effects[name]
+
+    def _setup_channels(self):
+        total = sum(self.group_sizes.values())
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), total))
+        pygame.mixer.set_reserved(total)
+
+        self.channels = {}
+        first_channel = 0
+        for group, size in self.group_sizes.items():
+            self.channels[group] = [[pygame.mixer.Channel(channel), 0, 0] for channel in range(first_channel, first_channel + size, 1)]
+            first_channel += size
+
+    def play(self, effect):
+        self.requested += 1
+        if effect.name in self.pending:
+            self.merged += 1
+        self.pending[effect.name] = effect
+
+    def _choose_voice(self, effect):
+        voices = self.channels[effect.group]
+        for voice in voices:
+            if not voice[0].get_busy():
+                return voice
+        
+        voice = min(voices, key=lambda voice: (voice[1], voice[2]))
+        if voice[1] > effect.priority:
+            return None
+        voice[0].stop()
+        self.stolen += 1
+        return voice
+
+    def flush(self):
+        self.frame += 1
+        if len(self.pending) == 0:
+            return
+        if pygame.mixer.get_init() is None:
+            self.pending.clear()
+            return
+        if self.channels is None:
+            self._setup_channels()
+
+        for effect in sorted(self.pending.values(), key=lambda effect: -effect.priority):
+            voice = self._choose_voice(effect)
+            if voice is None:
+                self.dropped += 1
+                continue
+            voice[0].play(effect.sound)
+            voice[1] = effect.priority
+            voice[2] = self.frame
+            self.played += 1
+        self.pending.clear()
+
+    def stop_all(self):
+        self.pending.clear()
+        if self.channels is not None:
+            for voices in self.channels.values():
+                for voice in voices:
+                    voice[0].stop()
+
+    def stats(self):
+        return {
+            'requested': self.requested,
+            'played': self.played,
+            'merged': self.merged,
+            'stolen': self.stolen,
+            'dropped': self.dropped,
+        }
+
+SOUND_MANAGER = SoundManager()
 
 class Sprite():
+    __slots__ = ('image', 'draw_rect', 'color')
+
     def __init__(self, path='', pos=(0, 0), dims=(10, 10), col=pygame.Color('White')):
         self.image = None
         self.draw_rect = pygame.Rect((0, 0), dims)
 
         if path != '':
             self.image = self._get_scaled_image_from_path(path)
-            self.draw_rect = self.image.get_rect()        
+            self.draw_rect = pygame.Rect((0, 0), to_world_size(self.image.get_size()))
 
         self.draw_rect.center = pos
         self.color = col
     
     def _get_scaled_image_from_path(self, path):
-        img = pygame.image.load(path).convert_alpha()
-        img_w = img.get_width()
-        img_h = img.get_height()
-        img = pygame.transform.scale_by(img, (UNIVERSAL_SPRITE_SCALE, UNIVERSAL_SPRITE_SCALE))
-        return img
+        return ASSET_CACHE.get_image(path)
 
     def get_draw_rect(self):
         return self.draw_rect
+
+    def get_dirty_rects(self):
+        return [to_render_rect(self.draw_rect)]
+
+    def get_render_state(self):
+        return (tuple(self.draw_rect), id(self.image))
     
     def set_position(self, pos=(0, 0)):
         self.draw_rect.center = pos
 
     def draw(self, screen):
         if self.image is not None:
-            screen.blit(self.image, self.draw_rect)
+            screen.blit(self.image, to_render_rect(self.draw_rect))
         else:
-            pygame.draw.rect(screen, self.color, self.draw_rect)
+            pygame.draw.rect(screen, self.color, to_render_rect(self.draw_rect))
 
-class AnimatedSprite(Sprite):
-    def __init__(self, path='', pos=(0, 0), fc=3, fps=12):
-        super().__init__()
+    def submit(self, batch, layer=0, pos=None):
+        if self.image is not None:
+            rect = self.draw_rect
+            if pos is not None:
+                rect = rect.copy()
+                rect.center = pos
+            batch.submit(self.image, to_render_rect(rect), layer)
+
+class SpriteDescriptor():
+    __slots__ = ('path', 'num_images', 'fps', 'images', 'image_replace_time', 'size')
 
+    def __init__(self, path='', fc=3, fps=12):
+        self.path = path
         self.num_images = fc
-        self.images = []
-        self._get_images_from_path(path)
+        self.fps = fps
+        self.images = ASSET_CACHE.get_frames(path, fc)
+        self.image_replace_time = 1.0 / fps
+        self.size = to_world_size(self.images[0].get_size())
+
+class AnimationTrack():
+    __slots__ = ('frames', 'fps', 'image_index', 'image')
 
+    def __init__(self, frames, fps=12):
+        self.frames = frames
+        self.fps = fps
         self.image_index = 0
-        self.image = self.images[self.image_index]
+        self.image = frames[0]
 
-        self.image_replace_time = 1.0 / fps
-        self.time_since_last_replace = 0
+    def update(self, time=0.0):
+        self.image_index = int(time * self.fps) % len(self.frames)
+        self.image = self.frames[self.image_index]
+
+class AnimationClock():
+    def __init__(self):
+        self.time = 0.0
+        self.tracks = {}
+
+    def get_track(self, frames, fps=12):
+        key = (frames, fps)
+        if key not in self.tracks:
+            self.tracks[key] = AnimationTrack(frames, fps)
+            self.tracks[key].update(self.time)
+        return self.tracks[key]
+
+    def _update_tracks(self):
+        for track in self.tracks.values():
+            track.update(self.time)
 
-        self.draw_rect = self.images[0].get_rect()
+    def advance(self, dt=0):
+        self.time += dt
+        self._update_tracks()
+
+    def reset(self, time=0.0):
+        self.time = time
+        self._update_tracks()
+
+    def frame_index(self, fc=3, fps=12, start_time=0.0, loop=True):
+        index = int((self.time - start_time) * fps)
+        if loop:
+            return index % fc
+        return min(index, fc - 1)
+
+ANIMATION_CLOCK = AnimationClock()
+
+class AnimatedSprite(Sprite):
+    __slots__ = ('descriptor', 'clock', 'loop', 'start_time', 'track', 'masks')
+
+    def __init__(self, path='', pos=(0, 0), fc=3, fps=12, loop=True, clock=ANIMATION_CLOCK):
+        self.masks = None
+        self.clock = clock
+        self.loop = loop
+        self.start_time = 0.0 if loop else clock.time
+        self.descriptor = ASSET_CACHE.get_sprite_descriptor(path, fc, fps)
+        self.track = clock.get_track(self.descriptor.images, fps) if loop else None
+
+        self.draw_rect = pygame.Rect((0, 0), self.descriptor.size)
         self.draw_rect.center = pos
 
-    def _get_images_from_path(self, new_path=''):
-        for num in range(0, self.num_images, 1):
-            self.images.append(self._get_scaled_image_from_path(f'{new_path}{num}.png'))
+    @property
+    def path(self):
+        return self.descriptor.path
+
+    @property
+    def num_images(self):
+        return self.descriptor.num_images
+
+    @property
+    def images(self):
+        return self.descriptor.images
+
+    @property
+    def fps(self):
+        return self.descriptor.fps
+
+    @property
+    def image_replace_time(self):
+        return self.descriptor.image_replace_time
     
     def set_framerate(self, fps=12):
-        self.image_replace_time = 1.0 / fps
-    
-    def update(self, dt=0, pos=(0, 0)):
-        self.time_since_last_replace += dt
+        self.descriptor = ASSET_CACHE.get_sprite_descriptor(self.path, self.num_images, fps)
+        self.track = self.clock.get_track(self.images, fps) if self.loop else None
+
+    @property
+    def image_index(self):
+        if self.loop:
+            return self.track.image_index
+        return self.clock.frame_index(self.num_images, self.fps, self.start_time, False)
+
+    @property
+    def image(self):
+        if self.loop:
+            return self.track.image
+        return self.images[self.image_index]
+
+    def load_masks(self):
+        if self.masks is None:
+            self.masks = ASSET_CACHE.get_frame_masks(self.path, self.num_images)
+        return self.masks
+
+    def get_mask(self):
+        return self.load_masks()[self.image_index]
+
+    def reset(self, pos=(0, 0)):
+        if not self.loop:
+            self.start_time = self.clock.time
+        self.draw_rect.center = pos
 
-        if self.time_since_last_replace >= self.image_replace_time:
-            self.image_index += 1
-            self.time_since_last_replace = 0
-        
-        if self.image_index == len(self.images):
-            self.image_index = 0
-        
-        self.image = self.images[self.image_index]
+    def get_state(self):
+        return {'start_time': self.start_time}
 
+    def set_state(self, state, pos=(0, 0)):
+        self.start_time = state['start_time']
         self.draw_rect.center = pos
 
 class Character():
+    __slots__ = ('pos_x', 'pos_y', 'previous_pos_y', 'initial_position', 'y_range', 'hitbox_rect', 'sprite', 'hitpoints', 'max_hitpoints', 'speed', 'time_since_last_shoot', 'shoot_cooldown_time', 'collision_mode')
+
     def __init__(self, sprite_details=('', 3, 12), pos=(0, 0), lim=(0, DISPLAY_HEIGHT), hb=(20, 20), hp=5, s=200, cdt=1.0):
         self.pos_x, self.pos_y = pos
+        self.previous_pos_y = self.pos_y
+        self.initial_position = pos
         self.y_range = lim
 
         self.hitbox_rect = pygame.Rect((0, 0), hb)
@@ -90,10 +711,64 @@ class Character():
 
         self.time_since_last_shoot = 0
         self.shoot_cooldown_time = cdt
+
+        self.collision_mode = 'rect'
     
     def position_vector(self):
         return (self.pos_x, self.pos_y)
 
+    def set_collision_mode(self, mode='rect'):
+        if mode not in COLLISION_MODES:
+            raise ValueError(f'unknown collision mode {mode!r}')
+        self.collision_mode = mode
+        if mode == 'mask':
+            self.sprite.load_masks()
+
+    def get_collision_rect(self):
+        return self.hitbox_rect
+
+    def find_pixel_hits(self, handles, left, top, right, bottom):
+        if self.collision_mode != 'mask' or len(handles) == 0:
+            return handles
+        
+        mask = self.sprite.get_mask()
+        rect = self.sprite.draw_rect
+        scale = mask.width / rect.width
+        left = np.maximum(left, self.hitbox_rect.left)
+        top = np.maximum(top, self.hitbox_rect.top)
+        right = np.minimum(right, self.hitbox_rect.right)
+        bottom = np.minimum(bottom, self.hitbox_rect.bottom)
+        covered = mask.count((left - rect.left) * scale, (top - rect.top) * scale, (right - rect.left) * scale, (bottom - rect.top) * scale)
+        return handles[covered > 0]
+
+    def interpolated_position(self, alpha=1.0):
+        return (self.pos_x, interpolate(self.previous_pos_y, self.pos_y, alpha))
+
+    def reset(self):
+        self.pos_x, self.pos_y = self.initial_position
+        self.previous_pos_y = self.pos_y
+        self.hitbox_rect.center = self.position_vector()
+        self.hitpoints = self.max_hitpoints
+        self.time_since_last_shoot = 0
+        self.sprite.reset(self.position_vector())
+
+    def get_state(self):
+        return {
+            'pos_y': self.pos_y,
+            'previous_pos_y': self.previous_pos_y,
+            'hitpoints': self.hitpoints,
+            'time_since_last_shoot': self.time_since_last_shoot,
+            'sprite': self.sprite.get_state(),
+        }
+
+    def set_state(self, state):
+        self.pos_y = state['pos_y']
+        self.previous_pos_y = state['previous_pos_y']
+        self.hitbox_rect.center = self.position_vector()
+        self.hitpoints = state['hitpoints']
+        self.time_since_last_shoot = state['time_since_last_shoot']
+        self.sprite.set_state(state['sprite'], self.position_vector())
+
     def _update_hitbox_rect_position(self, new_rect):
         self.pos_y = new_rect.center[1]
         self.hitbox_rect.center = self.position_vector()
@@ -119,6 +794,7 @@ class Character():
             return False
 
     def update(self, dt=0, direction=0):
+        self.previous_pos_y = self.pos_y
         self._manage_excessive_hitpoints
         self._manage_shoot_cooldown(dt, self.shoot_cooldown_time)
         
@@ -127,12 +803,20 @@ class Character():
             self.pos_y = projected_hitbox_rect.center[1]
             self._update_hitbox_rect_position(projected_hitbox_rect)
         
-        self.sprite.update(dt, self.position_vector())
+        self.sprite.set_position(self.position_vector())
     
     def draw(self, screen):
-        self.sprite.draw(screen)   
+        self.sprite.draw(screen)
+
+    def submit(self, batch, layer=0, alpha=1.0):
+        self.sprite.submit(batch, layer, self.interpolated_position(alpha))
+
+    def get_dirty_rects(self):
+        return self.sprite.get_dirty_rects()
 
 class Player(Character):
+    __slots__ = ('powerup_effect_duration', 'active_powerup', 'powerup_active_speed', 'powerup_active_shoot_cooldown_time', 'hitpoints_bar', 'shoot_sound', 'powerup_sound', 'blast_sound')
+
     def __init__(self, sprite_details=('images\\player\\character\\', 4, 12), pos=(0, 0), lim=(0, DISPLAY_HEIGHT), hb=(20, 20), hp=5, s=300, cdt=0.5):
         super().__init__(sprite_details, pos, lim, hb, hp, s, cdt)
 
@@ -144,14 +828,27 @@ class Player(Character):
 
         self.hitpoints_bar = MeterBar(pos=(45, 75), dims=(300, 30), sm=0, col='Blue', amt=self.hitpoints)
 
-        self.shoot_sound = pygame.mixer.Sound('sounds\\player_shoot.wav')
-        self.shoot_sound.set_volume(0.5)
+        self.shoot_sound = SOUND_MANAGER.get_effect('player_shoot')
+        self.powerup_sound = SOUND_MANAGER.get_effect('player_pickup_powerup')
+        self.blast_sound = SOUND_MANAGER.get_effect('player_blast')
 
-        self.powerup_sound = pygame.mixer.Sound('sounds\\player_pickup_powerup.wav')
-        self.powerup_sound.set_volume(0.5)
+    def reset(self):
+        super().reset()
+        self.powerup_effect_duration = 0.0
+        self.active_powerup = 0
+        self.hitpoints_bar.update(self.hitpoints)
+
+    def get_state(self):
+        state = super().get_state()
+        state['powerup_effect_duration'] = self.powerup_effect_duration
+        state['active_powerup'] = self.active_powerup
+        return state
 
-        self.blast_sound = pygame.mixer.Sound('sounds\\player_blast.wav')
-        self.blast_sound.set_volume(0.3)
+    def set_state(self, state):
+        super().set_state(state)
+        self.powerup_effect_duration = state['powerup_effect_duration']
+        self.active_powerup = state['active_powerup']
+        self.hitpoints_bar.update(self.hitpoints)
     
     def _configure_self_from_powerups(self):
         current_speed = self.speed
@@ -179,6 +876,7 @@ class Player(Character):
             return False
 
     def update(self, dt=0, direction=0):
+        self.previous_pos_y = self.pos_y
         if self.active_powerup != 0:
             self.powerup_effect_duration -= dt
         
@@ -191,17 +889,25 @@ class Player(Character):
         if not projected_hitbox_rect.top <= self.y_range[0] and not projected_hitbox_rect.bottom >= self.y_range[1]:
             self._update_hitbox_rect_position(projected_hitbox_rect)
         
-        self.sprite.update(dt, self.position_vector())
+        self.sprite.set_position(self.position_vector())
         self.hitpoints_bar.update(self.hitpoints)
     
     def draw(self, screen):
         super().draw(screen)
         self.hitpoints_bar.draw(screen)
 
+    def get_dirty_rects(self):
+        return super().get_dirty_rects() + self.hitpoints_bar.get_dirty_rects()
+
 class GiantKillerSpaceRobot(Character):
-    def __init__(self, sprite_details=('images\\gksr\\phase1\\character\\', 4, 12), pos=(0, 0), lim=(0, DISPLAY_HEIGHT), hb=(20, 20), hp=100, s=0, cdt=2.0, ppw=5, po=10):
+    __slots__ = ('attack_phase', 'attack_phases', 'phase_sprites', 'projectiles_per_wave', 'powerup_drop_chance', 'projectile_origin_positions', 'phase_patterns', 'attack_time', 'attack_queue', 'attack_sequence', 'hitpoints_bar', 'shoot_sound', 'blast_sound')
+
+    def __init__(self, sprite_details=('images\\gksr\\phase1\\character\\', 4, 12), pos=(0, 0), lim=(0, DISPLAY_HEIGHT), hb=(20, 20), hp=100, s=0, cdt=2.0, ppw=5, po=10, aps=GKSR_ATTACK_PHASES):
         super().__init__(sprite_details, pos, lim, hb, hp, s, cdt)
         self.attack_phase = 1
+        self.attack_phases = aps
+        self.phase_sprites = {phase: AnimatedSprite(f'images\\gksr\\phase{phase}\\character\\', pos, 4, 12) for phase in aps if phase != 1}
+        self.phase_sprites[1] = self.sprite
         self.projectiles_per_wave = ppw
         self.powerup_drop_chance = 10
 
@@ -210,46 +916,95 @@ class GiantKillerSpaceRobot(Character):
         origin_amounts = po
         for x in range(origin_amounts):
             self.projectile_origin_positions.append((1350, firing_range[0] + (((firing_range[1] - firing_range[0]) / origin_amounts) * (x + 1))))
+
+        self.phase_patterns = {phase: [compile_attack_pattern(GKSR_ATTACK_PATTERNS[name], details['projectiles_per_wave'], origin_amounts) for name in details['patterns']] for phase, details in aps.items()}
+        self.attack_time = 0.0
+        self.attack_queue = []
+        self.attack_sequence = 0
         
         self.hitpoints_bar = MeterBar(pos=(1845, 75), dims=(300, 30), sm=1, col='Red', amt=self.hitpoints)
 
-        self.shoot_sound = pygame.mixer.Sound('sounds\\gksr_shoot.wav')
-        self.blast_sound = pygame.mixer.Sound('sounds\\gksr_blast.wav')
+        self.shoot_sound = SOUND_MANAGER.get_effect('gksr_shoot')
+        self.blast_sound = SOUND_MANAGER.get_effect('gksr_blast')
     
+    def set_collision_mode(self, mode='rect'):
+        super().set_collision_mode(mode)
+        if mode == 'mask':
+            for sprite in self.phase_sprites.values():
+                sprite.load_masks()
+
+    def _switch_attack_phase(self, phase):
+        self.attack_phase = phase
+        self.sprite = self.phase_sprites[phase]
+        self.sprite.reset(self.position_vector())
+
     def _manage_attack_phase(self):
         health_percent = self.hitpoints / self.max_hitpoints
-        phase_changed = False
-        if health_percent < 0.66 and self.attack_phase == 1:
-            self.attack_phase = 2
-            phase_changed = True
-        elif health_percent < 0.33 and self.attack_phase == 2:
-            self.attack_phase = 3
-            phase_changed = True
-        
-        if phase_changed == True:
-            self.sprite = AnimatedSprite(f'images\\gksr\\phase{self.attack_phase}\\character\\', (self.pos_x, self.pos_y), 4, 12)
+        next_phase = self.attack_phase + 1
+        if next_phase in self.attack_phases and health_percent < self.attack_phases[next_phase]['health_percent']:
+            self._switch_attack_phase(next_phase)
+
+    def set_attack_phase(self, phase):
+        if phase == 1:
+            self.hitpoints = self.max_hitpoints
+        else:
+            self.hitpoints = math.ceil(self.max_hitpoints * self.attack_phases[phase]['health_percent']) - 1
+        self._switch_attack_phase(phase)
+        self._manage_self_from_attack_phase()
+        self.hitpoints_bar.update(self.hitpoints)
+
+    def reset(self):
+        super().reset()
+        self._switch_attack_phase(1)
+        self._manage_self_from_attack_phase()
+        self.hitpoints_bar.update(self.hitpoints)
+        self.attack_time = 0.0
+        self.attack_queue.clear()
+        self.attack_sequence = 0
+
+    def get_state(self):
+        state = super().get_state()
+        state['attack_phase'] = self.attack_phase
+        state['attack_time'] = self.attack_time
+        state['attack_queue'] = [list(entry) for entry in self.attack_queue]
+        state['attack_sequence'] = self.attack_sequence
+        return state
+
+    def set_state(self, state):
+        self.attack_phase = state['attack_phase']
+        self.sprite = self.phase_sprites[self.attack_phase]
+        self.attack_time = state['attack_time']
+        self.attack_queue[:] = [tuple(entry) for entry in state['attack_queue']]
+        self.attack_sequence = state['attack_sequence']
+        super().set_state(state)
+        self._manage_self_from_attack_phase()
+        self.hitpoints_bar.update(self.hitpoints)
     
     def _manage_self_from_attack_phase(self):
-        if self.attack_phase == 1:
-            self.projectiles_per_wave = 5
-            self.cooldown_time = 2.0
-            self.powerup_drop_chance = 40
-        elif self.attack_phase == 2:
-            self.projectiles_per_wave = 6
-            self.cooldown_time = 1.5
-            self.powerup_drop_chance = 30
-        if self.attack_phase == 3:
-            self.projectiles_per_wave = 7
-            self.cooldown_time = 1.0
-            self.powerup_drop_chance = 20
+        phase_details = self.attack_phases[self.attack_phase]
+        self.projectiles_per_wave = phase_details['projectiles_per_wave']
+        self.shoot_cooldown_time = phase_details['cooldown_time']
+        self.powerup_drop_chance = phase_details['powerup_drop_chance']
+
+    def schedule_attack(self, timeline, origin_indices, powerup_slot=-1):
+        for slot, (delay, speed, projectile_type) in enumerate(timeline):
+            entry = (self.attack_time + delay, self.attack_sequence, origin_indices[slot], speed, projectile_type if slot != powerup_slot else '', self.attack_phase)
+            heapq.heappush(self.attack_queue, entry)
+            self.attack_sequence += 1
+
+    def pop_due_attacks(self):
+        due = []
+        while len(self.attack_queue) > 0 and self.attack_queue[0][0] <= self.attack_time:
+            due.append(heapq.heappop(self.attack_queue))
+        return due
 
     def update(self, dt=0):
         super().update(dt, 0)
+        self.attack_time += dt
 
         self._manage_attack_phase()
         self._manage_self_from_attack_phase()
 
-        self.sprite.update(dt, self.position_vector())
         self.hitpoints_bar.update(self.hitpoints)
         return
     
@@ -257,14 +1012,20 @@ class GiantKillerSpaceRobot(Character):
         super().draw(screen)
         self.hitpoints_bar.draw(screen)
 
+    def get_dirty_rects(self):
+        return super().get_dirty_rects() + self.hitpoints_bar.get_dirty_rects()
+
 class Blast():
+    __slots__ = ('pos_x', 'pos_y', 'hitbox_rect', 'sprite_details', 'sprite', 'lifetime', 'lifespan')
+
     def __init__(self, sprite_details=('', 3, 12), pos=(0, 0), hb=(20, 20)):
         self.pos_x, self.pos_y = pos
         
         self.hitbox_rect = pygame.Rect((0, 0), hb)
         self.hitbox_rect.center = self.position_vector()
         
-        self.sprite = AnimatedSprite(sprite_details[0], pos, sprite_details[1], sprite_details[2])
+        self.sprite_details = sprite_details
+        self.sprite = AnimatedSprite(sprite_details[0], pos, sprite_details[1], sprite_details[2], loop=False)
 
         self.lifetime = 0
         self.lifespan = self.sprite.image_replace_time * self.sprite.num_images
@@ -274,21 +1035,45 @@ class Blast():
     
     def should_die(self):
         return self.lifetime >= self.lifespan
+
+    def get_state(self):
+        return {
+            'sprite_details': self.sprite_details,
+            'pos': self.position_vector(),
+            'hb': self.hitbox_rect.size,
+            'lifetime': self.lifetime,
+            'sprite': self.sprite.get_state(),
+        }
+    
+    @classmethod
+    def from_state(cls, state):
+        blast = cls(tuple(state['sprite_details']), tuple(state['pos']), tuple(state['hb']))
+        blast.lifetime = state['lifetime']
+        blast.sprite.set_state(state['sprite'], blast.position_vector())
+        return blast
     
     def update(self, dt=0):
         self.lifetime += dt
-        self.sprite.update(dt, self.position_vector())
     
     def draw(self, screen):
         self.sprite.draw(screen)
 
+    def submit(self, batch, layer=0):
+        self.sprite.submit(batch, layer)
+
+    def get_dirty_rects(self):
+        return self.sprite.get_dirty_rects()
+
 class MovingObject():
+    __slots__ = ('pos_x', 'pos_y', 'hitbox_rect', 'sprite_details', 'sprite', 'speed', 'direction', 'onscreen', 'previous_pos_x')
+
     def __init__(self, sprite_details=('', 3, 12), pos=(0, 0), hb=(20, 20), s=200, dir=0):
         self.pos_x, self.pos_y = pos
 
         self.hitbox_rect = pygame.Rect((0, 0), hb)
         self.hitbox_rect.center = self.position_vector()
 
+        self.sprite_details = sprite_details
         self.sprite = None
         if sprite_details[0] != '':
             self.sprite = AnimatedSprite(sprite_details[0], pos, sprite_details[1], sprite_details[2])
@@ -298,9 +1083,16 @@ class MovingObject():
         self.speed = s
         self.direction = dir
         self.onscreen = True
+        self.previous_pos_x = self.pos_x
     
     def position_vector(self):
         return (self.pos_x, self.pos_y)
+
+    def interpolated_position(self, alpha=1.0):
+        return (interpolate(self.previous_pos_x, self.pos_x, alpha), self.pos_y)
+
+    def get_swept_hitbox_rect(self):
+        return self.hitbox_rect.union(self.hitbox_rect.move(round(self.previous_pos_x - self.pos_x), 0))
     
     def _is_onscreen(self):
         game_window_rect = pygame.Rect((0,0), (DISPLAY_WIDTH, DISPLAY_HEIGHT))
@@ -312,46 +1104,424 @@ class MovingObject():
 
     def update(self, dt=0):        
         self.onscreen = self._is_onscreen()
+        self.previous_pos_x = self.pos_x
         if self.onscreen:
             self._adjust_position(dt)
-            self.sprite.update(dt, self.position_vector())
+            self.sprite.set_position(self.position_vector())
     
     def check_hit(self, rect):
-        return self.hitbox_rect.colliderect(rect)
+        return self.get_swept_hitbox_rect().colliderect(rect)
     
     def draw(self, screen):
         self.sprite.draw(screen)
 
-class Projectile(MovingObject):
-    def __init__(self, sprite_details=('', 3, 12), pos=(0, 0), hb=(20, 20), s=200, dir=0, dmg=0, bd=(('', 3, 12), (0, 0), (20, 20))):
-        super().__init__(sprite_details, pos, hb, s, dir)
+    def submit(self, batch, layer=0, alpha=1.0):
+        self.sprite.submit(batch, layer, self.interpolated_position(alpha))
+
+    def get_dirty_rects(self):
+        return self.sprite.get_dirty_rects()
+
+class ProjectilePool():
+    def __init__(self, cap=256, clock=ANIMATION_CLOCK):
+        self.capacity = 0
+        self.clock = clock
+        self.kinds = []
+        self.kind_tracks = []
+        self.kind_ids = {}
+        self.free_slots = []
+
+        self.pos_x = np.zeros(0, dtype=np.float64)
+        self.pos_y = np.zeros(0, dtype=np.float64)
+        self.previous_pos_x = np.zeros(0, dtype=np.float64)
+        self.velocity_x = np.zeros(0, dtype=np.float64)
+        self.damage = np.zeros(0, dtype=np.int64)
+        self.kind = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+
+        self.hitbox_w = np.zeros(0, dtype=np.float64)
+        self.hitbox_h = np.zeros(0, dtype=np.float64)
+        self.draw_w = np.zeros(0, dtype=np.float64)
+        self.draw_h = np.zeros(0, dtype=np.float64)
+
+        self._grow(cap)
+
+    def __len__(self):
+        return self.capacity - len(self.free_slots)
+
+    def _grow(self, new_capacity):
+        added = new_capacity - self.capacity
+        for name in ('pos_x', 'pos_y', 'previous_pos_x', 'velocity_x', 'damage', 'kind', 'alive', 'hitbox_w', 'hitbox_h', 'draw_w', 'draw_h'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate((array, np.zeros(added, dtype=array.dtype))))
+        
+        self.free_slots.extend(range(new_capacity - 1, self.capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def _get_kind_id(self, sprite_details, hb, bd):
+        key = (sprite_details, hb, bd)
+        if key not in self.kind_ids:
+            frames = ASSET_CACHE.get_frames(sprite_details[0], sprite_details[1])
+            self.kind_ids[key] = len(self.kinds)
+            self.kinds.append((frames, sprite_details, hb, bd))
+            self.kind_tracks.append(self.clock.get_track(frames, sprite_details[2]))
+        return self.kind_ids[key]
+
+    def spawn(self, sprite_details=('', 3, 12), pos=(0, 0), hb=(20, 20), s=200, dir=0, dmg=0, bd=(('', 3, 12), (0, 0), (20, 20))):
+        if len(self.free_slots) == 0:
+            self._grow(self.capacity * 2)
+        
+        index = self.free_slots.pop()
+        return self._fill_slot(index, self._get_kind_id(sprite_details, hb, bd), pos, s * dir, dmg)
+
+    def _fill_slot(self, index, kind_id, pos, velocity_x, dmg):
+        frames, sprite_details, hb, bd = self.kinds[kind_id]
+
+        self.pos_x[index], self.pos_y[index] = pos
+        self.previous_pos_x[index] = self.pos_x[index]
+        self.velocity_x[index] = velocity_x
+        self.damage[index] = dmg
+        self.kind[index] = kind_id
+        self.alive[index] = True
+
+        self.hitbox_w[index], self.hitbox_h[index] = hb
+        self.draw_w[index], self.draw_h[index] = to_world_size(frames[0].get_size())
+        return index
+
+    def release(self, indices):
+        self.alive[indices] = False
+        self.free_slots.extend(np.asarray(indices).tolist())
+
+    def clear(self):
+        self.alive[:] = False
+        self.free_slots[:] = range(self.capacity - 1, -1, -1)
+
+    def _unused_slot_count(self):
+        count = 0
+        while count < len(self.free_slots) and self.free_slots[count] == self.capacity - 1 - count:
+            count += 1
+        return count
+
+    def get_state(self):
+        live_indices = np.flatnonzero(self.alive)
+        kind_positions = {}
+        for kind in self.kind[live_indices].tolist():
+            kind_positions.setdefault(kind, len(kind_positions))
+        return {
+            'kinds': [self.kinds[kind][1:] for kind in kind_positions],
+            'slots': live_indices.tolist(),
+            'kind': [kind_positions[kind] for kind in self.kind[live_indices].tolist()],
+            'pos_x': self.pos_x[live_indices].tolist(),
+            'pos_y': self.pos_y[live_indices].tolist(),
+            'previous_pos_x': self.previous_pos_x[live_indices].tolist(),
+            'velocity_x': self.velocity_x[live_indices].tolist(),
+            'damage': self.damage[live_indices].tolist(),
+            'free_slots': self.free_slots[self._unused_slot_count():],
+        }
+
+    def set_state(self, state):
+        used_count = max(state['slots'] + state['free_slots'], default=-1) + 1
+        while used_count > self.capacity:
+            self._grow(self.capacity * 2)
+        self.alive[:] = False
+
+        kind_ids = [self._get_kind_id(*to_tuples(kind)) for kind in state['kinds']]
+        for position, index in enumerate(state['slots']):
+            self._fill_slot(index, kind_ids[state['kind'][position]], (state['pos_x'][position], state['pos_y'][position]), state['velocity_x'][position], state['damage'][position])
+            self.previous_pos_x[index] = state['previous_pos_x'][position]
+        self.free_slots[:] = list(range(self.capacity - 1, used_count - 1, -1)) + state['free_slots']
+
+    def position_vector(self, index):
+        return (float(self.pos_x[index]), float(self.pos_y[index]))
+
+    def blast_details(self, index):
+        return self.kinds[self.kind[index]][3]
+
+    def _current_images(self):
+        return [track.image for track in self.kind_tracks]
+
+    def _cull_offscreen(self):
+        left = self.pos_x - (self.draw_w / 2)
+        top = self.pos_y - (self.draw_h / 2)
+        onscreen = (left < DISPLAY_WIDTH) & (left + self.draw_w > 0) & (top < DISPLAY_HEIGHT) & (top + self.draw_h > 0)
+        self.release(np.flatnonzero(self.alive & ~onscreen))
 
-        self.damage = dmg
-        self.blast_details = bd
+    def update(self, dt=0):
+        if len(self) == 0:
+            return
+
+        self.previous_pos_x[self.alive] = self.pos_x[self.alive]
+        self.pos_x[self.alive] += self.velocity_x[self.alive] * dt
+        self._cull_offscreen()
+
+    def hitbox_bounds(self, indices=None):
+        live_indices = np.flatnonzero(self.alive) if indices is None else np.asarray(indices)
+        start_x = self.previous_pos_x[live_indices]
+        end_x = self.pos_x[live_indices]
+        half_w = self.hitbox_w[live_indices] / 2
+        top = self.pos_y[live_indices] - (self.hitbox_h[live_indices] / 2)
+        return (live_indices, np.minimum(start_x, end_x) - half_w, top, np.maximum(start_x, end_x) + half_w, top + self.hitbox_h[live_indices])
+
+    def find_hits(self, rect):
+        live_indices, left, top, right, bottom = self.hitbox_bounds()
+        hits = (left < rect.right) & (right > rect.left) & (top < rect.bottom) & (bottom > rect.top)
+        return live_indices[hits]
+
+    def _render_bounds(self, live_indices, alpha=1.0):
+        lefts = (interpolate(self.previous_pos_x[live_indices], self.pos_x[live_indices], alpha) - (self.draw_w[live_indices] // 2)) * RENDER_SCALE
+        tops = (self.pos_y[live_indices] - (self.draw_h[live_indices] // 2)) * RENDER_SCALE
+        widths = np.rint(self.draw_w[live_indices] * RENDER_SCALE)
+        heights = np.rint(self.draw_h[live_indices] * RENDER_SCALE)
+        return (lefts, tops, widths, heights)
+
+    def draw(self, screen, alpha=1.0):
+        live_indices = np.flatnonzero(self.alive)
+        lefts, tops, widths, heights = self._render_bounds(live_indices, alpha)
+        kinds = self.kind[live_indices].tolist()
+        images = self._current_images()
+
+        draws = [(images[kind], (left, top)) for kind, left, top in zip(kinds, lefts.astype(np.int64).tolist(), tops.astype(np.int64).tolist())]
+        screen.blits(draws, doreturn=False)
+
+    def submit(self, batch, layer=0, alpha=1.0):
+        live_indices = np.flatnonzero(self.alive)
+        lefts, tops, widths, heights = self._render_bounds(live_indices, alpha)
+        onscreen = (lefts < batch.screen_rect.right) & (lefts + widths > batch.screen_rect.left) & (tops < batch.screen_rect.bottom) & (tops + heights > batch.screen_rect.top)
+        batch.culled += len(live_indices) - int(np.count_nonzero(onscreen))
+
+        kinds = self.kind[live_indices[onscreen]].tolist()
+        images = self._current_images()
+        rects = [pygame.Rect(left, top, width, height) for left, top, width, height in zip(lefts[onscreen].astype(np.int64).tolist(), tops[onscreen].astype(np.int64).tolist(), widths[onscreen].astype(np.int64).tolist(), heights[onscreen].astype(np.int64).tolist())]
+        batch.submit_many([(images[kind], rect) for kind, rect in zip(kinds, rects)], layer)
+
+    def get_dirty_rects(self, alpha=1.0):
+        lefts, tops, widths, heights = self._render_bounds(np.flatnonzero(self.alive), alpha)
+        return [pygame.Rect(left, top, width, height) for left, top, width, height in zip(lefts.astype(np.int64).tolist(), tops.astype(np.int64).tolist(), widths.astype(np.int64).tolist(), heights.astype(np.int64).tolist())]
+
+class CollisionGrid():
+    def __init__(self, me=COLLISION_GRID_MIN_ENTRIES, mq=COLLISION_GRID_MIN_QUERIES):
+        self.min_sorted_entries = me
+        self.min_sorted_queries = mq
+        self.groups = {}
+
+        self.queries = 0
+        self.candidate_pairs = 0
+        self.hit_pairs = 0
+        self.last_frame_stats = self.stats()
+
+    def begin_frame(self):
+        self.last_frame_stats = self.stats()
+        self.groups.clear()
+        self.queries = 0
+        self.candidate_pairs = 0
+        self.hit_pairs = 0
+
+    def register_bounds(self, group, handles, left, top, right, bottom):
+        self.groups[id(group)] = [None, 0.0, np.asarray(handles), (left, top, right, bottom), 0]
+
+    def register_pool(self, pool):
+        live_indices, left, top, right, bottom = pool.hitbox_bounds()
+        self.register_bounds(pool, live_indices, left, top, right, bottom)
+
+    def register_objects(self, objects):
+        rects = [obj.get_swept_hitbox_rect() for obj in objects]
+        left = np.array([rect.left for rect in rects], dtype=np.float64)
+        top = np.array([rect.top for rect in rects], dtype=np.float64)
+        right = np.array([rect.right for rect in rects], dtype=np.float64)
+        bottom = np.array([rect.bottom for rect in rects], dtype=np.float64)
+        self.register_bounds(objects, np.arange(len(objects)), left, top, right, bottom)
+
+    def _sort(self, entry):
+        handles = entry[2]
+        left, top, right, bottom = entry[3]
+        order = np.argsort(left)
+        entry[0] = (handles[order], left[order], top[order], right[order], bottom[order])
+        entry[1] = float((right - left).max(initial=0.0))
+
+    def query(self, group, rect):
+        self.queries += 1
+        entry = self.groups[id(group)]
+        entry[4] += 1
+        if entry[0] is None and entry[4] > self.min_sorted_queries and len(entry[2]) >= self.min_sorted_entries:
+            self._sort(entry)
+
+        sorted_bounds, max_width, handles, bounds, group_queries = entry
+        if sorted_bounds is None:
+            return self._narrowphase(handles, bounds, rect)
+
+        sorted_handles, left, top, right, bottom = sorted_bounds
+        first = left.searchsorted(rect.left - max_width)
+        last = left.searchsorted(rect.right)
+        return np.sort(self._narrowphase(sorted_handles[first:last], (left[first:last], top[first:last], right[first:last], bottom[first:last]), rect))
+
+    def _narrowphase(self, handles, bounds, rect):
+        self.candidate_pairs += len(handles)
+
+        left, top, right, bottom = bounds
+        hits = (left < rect.right) & (right > rect.left) & (top < rect.bottom) & (bottom > rect.top)
+        hit_handles = handles[hits]
+        self.hit_pairs += len(hit_handles)
+        return hit_handles
+
+    def stats(self):
+        return {
+            'queries': self.queries,
+            'candidate_pairs': self.candidate_pairs,
+            'hit_pairs': self.hit_pairs,
+        }
+
+class StarField():
+    def __init__(self, count=300, x_range=(0, DISPLAY_WIDTH), y_range=(0, DISPLAY_HEIGHT), s_range=(100, 400), x_lim=DISPLAY_WIDTH+50, rx_range=(-64, -16), size=3, col=pygame.Color('White'), seed=None):
+        self.count = count
+        self.y_range = y_range
+        self.speed_range = s_range
+        self.x_limit = x_lim
+        self.respawn_x_range = rx_range
 
-class Star(MovingObject):
-    def __init__(self, sprite_details=('', (4, 4), pygame.Color('White')), pos=(0, 0), hb=(20, 20), s=200, dir=0, x_lim=DISPLAY_WIDTH+50):
-        super().__init__(sprite_details, pos, hb, s, dir)
+        self.size = size
+        self.color = col
 
-        self.x_limit = x_lim
-    
-    def _is_onscreen(self):
-        return self.pos_x < self.x_limit
+        self.x_range = x_range
+        self.rng = np.random.default_rng(seed)
+
+        self.pos_x = np.zeros(count, dtype=np.float64)
+        self.pos_y = np.zeros(count, dtype=np.float64)
+        self.speed = np.zeros(count, dtype=np.float64)
+        self.previous_pos_x = np.zeros(count, dtype=np.float64)
+        self.reset()
+
+        self.pixel_size = max(1, round(size * RENDER_SCALE))
+        self.star_surface = pygame.Surface((self.pixel_size, self.pixel_size))
+        self.star_surface.fill(col)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        
+        self.pos_x[:] = self.rng.integers(self.x_range[0], self.x_range[1], self.count, endpoint=True)
+        self.pos_y[:] = self.rng.integers(self.y_range[0], self.y_range[1], self.count, endpoint=True)
+        self.speed[:] = self.rng.integers(self.speed_range[0], self.speed_range[1], self.count, endpoint=True)
+        self.previous_pos_x[:] = self.pos_x
+
+    def get_state(self):
+        return {
+            'pos_x': self.pos_x.tolist(),
+            'pos_y': self.pos_y.tolist(),
+            'speed': self.speed.tolist(),
+            'previous_pos_x': self.previous_pos_x.tolist(),
+            'rng': self.rng.bit_generator.state,
+        }
+
+    def set_state(self, state):
+        self.pos_x[:] = state['pos_x']
+        self.pos_y[:] = state['pos_y']
+        self.speed[:] = state['speed']
+        self.previous_pos_x[:] = state['previous_pos_x']
+        self.rng.bit_generator.state = state['rng']
+
+    def _recycle_offscreen_stars(self):
+        offscreen = self.pos_x >= self.x_limit
+        recycled_count = np.count_nonzero(offscreen)
+        if recycled_count == 0:
+            return
+
+        self.pos_x[offscreen] = self.rng.integers(self.respawn_x_range[0], self.respawn_x_range[1], recycled_count, endpoint=True)
+        self.pos_y[offscreen] = self.rng.integers(self.y_range[0], self.y_range[1], recycled_count, endpoint=True)
+        self.speed[offscreen] = self.rng.integers(self.speed_range[0], self.speed_range[1], recycled_count, endpoint=True)
 
     def update(self, dt=0):
-        self.onscreen = self._is_onscreen()
-        if self.onscreen:
-            self._adjust_position(dt)
-            self.sprite.set_position(self.position_vector())
+        self._recycle_offscreen_stars()
+        self.previous_pos_x[:] = self.pos_x
+        self.pos_x += self.speed * dt
+
+    def _draw_with_pixel_buffer(self, screen, alpha=1.0):
+        screen_w, screen_h = screen.get_size()
+        pitch = screen.get_pitch() // 4
+        size = self.pixel_size
+        left, top = self._render_positions(np.intp, alpha)
+
+        inside = (left >= 0) & (left <= screen_w - size) & (top >= 0) & (top <= screen_h - size)
+        on_edge = ~inside & (left > -size) & (left < screen_w) & (top > -size) & (top < screen_h)
+
+        mapped_color = screen.map_rgb(self.color)
+        pixel_buffer = screen.get_buffer()
+        pixels = np.frombuffer(pixel_buffer, dtype=np.uint32)
+
+        base_indices = left[inside] + (top[inside] * pitch)
+        pixels[(base_indices[:, None] + self._pixel_offsets(pitch)).ravel()] = mapped_color
+
+        edge_left = left[on_edge]
+        edge_top = top[on_edge]
+        for offset_x in range(0, size, 1):
+            xs = edge_left + offset_x
+            for offset_y in range(0, size, 1):
+                ys = edge_top + offset_y
+                visible = (xs >= 0) & (xs < screen_w) & (ys >= 0) & (ys < screen_h)
+                pixels[xs[visible] + (ys[visible] * pitch)] = mapped_color
+
+        del pixels
+        del pixel_buffer
+
+    def _pixel_offsets(self, pitch):
+        return np.array([x + (y * pitch) for y in range(0, self.pixel_size, 1) for x in range(0, self.pixel_size, 1)], dtype=np.intp)
+
+    def _render_positions(self, dtype=np.int64, alpha=1.0):
+        offset = self.pixel_size // 2
+        pos_x = interpolate(self.previous_pos_x, self.pos_x, alpha)
+        if RENDER_SCALE == 1.0:
+            return (pos_x.astype(dtype) - offset, self.pos_y.astype(dtype) - offset)
+        return ((pos_x * RENDER_SCALE).astype(dtype) - offset, (self.pos_y * RENDER_SCALE).astype(dtype) - offset)
+
+    def _draw_with_blits(self, screen, alpha=1.0):
+        lefts, tops = self._render_positions(alpha=alpha)
+        screen.blits([(self.star_surface, (left, top)) for left, top in zip(lefts.tolist(), tops.tolist())], doreturn=False)
+
+    def draw(self, screen, alpha=1.0):
+        if screen.get_bytesize() == 4:
+            self._draw_with_pixel_buffer(screen, alpha)
+        else:
+            self._draw_with_blits(screen, alpha)
+
+    def get_dirty_rects(self, limit=STAR_DIRTY_RECT_LIMIT, alpha=1.0):
+        if self.count > limit:
+            return [pygame.Rect((0, 0), render_size())]
+        
+        lefts, tops = self._render_positions(alpha=alpha)
+        return [pygame.Rect(left, top, self.pixel_size, self.pixel_size) for left, top in zip(lefts.tolist(), tops.tolist())]
 
 class PowerUp(MovingObject):
+    __slots__ = ('code', 'duration')
+
     def __init__(self, sprite_details=('', 3, 12), pos=(0, 0), hb=(20, 20), s=200, dir=-1, c=1, dur=5):
         super().__init__(sprite_details, pos, hb, s, dir)
 
         self.code = c
         self.duration = dur
 
+    def get_state(self):
+        return {
+            'sprite_details': self.sprite_details,
+            'pos': self.position_vector(),
+            'hb': self.hitbox_rect.size,
+            's': self.speed,
+            'dir': self.direction,
+            'c': self.code,
+            'dur': self.duration,
+            'onscreen': self.onscreen,
+            'previous_pos_x': self.previous_pos_x,
+            'sprite': self.sprite.get_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        powerup = cls(tuple(state['sprite_details']), tuple(state['pos']), tuple(state['hb']), state['s'], state['dir'], state['c'], state['dur'])
+        powerup.onscreen = state['onscreen']
+        powerup.previous_pos_x = state['previous_pos_x']
+        powerup.sprite.set_state(state['sprite'], powerup.position_vector())
+        return powerup
+
 class MeterBar():
+    __slots__ = ('position', 'max_width', 'height', 'shrink_mode', 'color', 'background_color', 'max_amount', 'amount', 'draw_rect', 'outline_rect', 'background_rect')
+
     def __init__(self, pos=(0, 0), dims=(250, 50), sm=0, col='White', amt=100):
         self.position = pos
 
@@ -360,6 +1530,7 @@ class MeterBar():
 
         self.shrink_mode = sm
         self.color = col
+        self.background_color = pygame.Color(col).lerp('Black', 0.5)
 
         self.max_amount = amt
         self.amount = self.max_amount
@@ -391,32 +1562,506 @@ class MeterBar():
             self.draw_rect.midtop = self.position
 
     def draw(self, screen):
-        pygame.draw.rect(screen, 'Black', self.outline_rect)
-        pygame.draw.rect(screen, pygame.Color(self.color).lerp('Black', 0.5), self.background_rect)
-        pygame.draw.rect(screen, self.color, self.draw_rect)
+        pygame.draw.rect(screen, 'Black', to_render_rect(self.outline_rect))
+        pygame.draw.rect(screen, self.background_color, to_render_rect(self.background_rect))
+        pygame.draw.rect(screen, self.color, to_render_rect(self.draw_rect))
+
+    def get_dirty_rects(self):
+        return [to_render_rect(self.outline_rect)]
+
+    def get_render_state(self):
+        return tuple(self.draw_rect)
 
 class PowerUpIndicator():
-    def __init__(self, pos=(0, 0), dims=(100, 100)):
+    def __init__(self, pos=(0, 0), dims=(100, 100), codes=(1, 2, 3)):
         self.draw_rect = pygame.Rect((0, 0), dims)
         self.draw_rect.center = pos
 
         self.position_vector = pos
 
+        self.icons = {code: Sprite(path=f'images\\powerups\\{code}.png', pos=self.position_vector) for code in codes}
         self.image = None
         self.powerup_code = 0
 
     def update(self, new_code=0):
-        if new_code != 0:
-            self.image = Sprite(path=f'images\\powerups\\{new_code}.png', pos=self.position_vector,)
-        else:
-            self.image = None
+        if new_code == self.powerup_code:
+            return
+        
+        self.powerup_code = new_code
+        self.image = self.icons.get(new_code)
     
     def draw(self, screen):
-        pygame.draw.rect(screen, pygame.Color('Black'), self.draw_rect)
+        pygame.draw.rect(screen, pygame.Color('Black'), to_render_rect(self.draw_rect))
 
         if self.image is not None:
             self.image.draw(screen)
 
+    def get_dirty_rects(self):
+        return [to_render_rect(self.draw_rect)]
+
+    def get_render_state(self):
+        return self.powerup_code
+
+class HudLayer():
+    def __init__(self, widgets=()):
+        self.widgets = list(widgets)
+
+        self.bounds = self.widgets[0].get_dirty_rects()[0].unionall([rect for widget in self.widgets for rect in widget.get_dirty_rects()])
+        self.surface = pygame.Surface((self.bounds.right, self.bounds.bottom), pygame.SRCALPHA)
+
+        self.cached_state = None
+        self.rebuilds = 0
+
+    def _rebuild(self):
+        self.surface.fill((0, 0, 0, 0))
+        for widget in self.widgets:
+            widget.draw(self.surface)
+        self.rebuilds += 1
+
+    def update(self):
+        state = tuple(widget.get_render_state() for widget in self.widgets)
+        if state != self.cached_state:
+            self._rebuild()
+            self.cached_state = state
+
+    def draw(self, screen):
+        self.update()
+        screen.blit(self.surface, self.bounds, self.bounds)
+
+    def submit(self, batch, layer=LAYER_HUD):
+        self.update()
+        batch.submit(self.surface, self.bounds, layer, self.bounds)
+
+    def get_dirty_rects(self):
+        return [self.bounds.copy()]
+
+class SpriteBatch():
+    def __init__(self, screen_rect=None):
+        self.screen_rect = screen_rect if screen_rect is not None else pygame.Rect((0, 0), render_size())
+        self.layers = {}
+        self.dirty_rects = []
+
+        self.submitted = 0
+        self.culled = 0
+        self.blit_calls = 0
+        self.last_frame_stats = self.stats()
+
+    def submit(self, surface, rect, layer=0, area=None):
+        if not self.screen_rect.colliderect(rect):
+            self.culled += 1
+            return
+        
+        rect = pygame.Rect(rect)
+        if area is None:
+            self.layers.setdefault(layer, []).append((surface, rect))
+        else:
+            self.layers.setdefault(layer, []).append((surface, rect, area))
+        self.dirty_rects.append(rect)
+        self.submitted += 1
+
+    def submit_many(self, draws, layer=0):
+        self.layers.setdefault(layer, []).extend(draws)
+        self.dirty_rects.extend(rect for surface, rect in draws)
+        self.submitted += len(draws)
+
+    def flush(self, screen):
+        for layer in sorted(self.layers):
+            draws = self.layers[layer]
+            if len(draws) > 0:
+                screen.blits(draws, doreturn=False)
+                self.blit_calls += 1
+        
+        dirty_rects = self.dirty_rects
+        self.last_frame_stats = self.stats()
+        self.layers.clear()
+        self.dirty_rects = []
+        self.submitted = 0
+        self.culled = 0
+        self.blit_calls = 0
+        return dirty_rects
+
+    def stats(self):
+        return {
+            'submitted': self.submitted,
+            'culled': self.culled,
+            'blit_calls': self.blit_calls,
+        }
+
+class DirtyRectRenderer():
+    def __init__(self, screen, fr=FULL_REDRAW_AREA_RATIO):
+        self.screen = screen
+        self.screen_rect = screen.get_rect()
+        self.background = pygame.Surface(screen.get_size())
+        self.full_redraw_area = self.screen_rect.width * self.screen_rect.height * fr
+
+        self.previous_rects = []
+        self.needs_full_redraw = True
+
+        self.full_redraws = 0
+        self.partial_updates = 0
+        self.skipped_updates = 0
+        self.last_updated_area = 0
+
+    def set_background(self, col=None, drawables=()):
+        if col is not None:
+            self.background.fill(col)
+        for drawable in drawables:
+            drawable.draw(self.background)
+        
+        self.screen.blit(self.background, (0, 0))
+        self.needs_full_redraw = True
+
+    def begin_frame(self):
+        if self.needs_full_redraw:
+            self.screen.blit(self.background, (0, 0))
+        elif len(self.previous_rects) > 0:
+            self.screen.blits([(self.background, rect, rect) for rect in self.previous_rects], doreturn=False)
+
+    def present(self, rects=()):
+        current_rects = [rect.clip(self.screen_rect) for rect in rects]
+        current_rects = [rect for rect in current_rects if rect.width > 0 and rect.height > 0]
+        dirty_rects = [pygame.Rect(rect) for rect in dict.fromkeys(tuple(rect) for rect in self.previous_rects + current_rects)]
+        self.last_updated_area = sum(rect.width * rect.height for rect in dirty_rects)
+
+        if self.needs_full_redraw or self.last_updated_area >= self.full_redraw_area:
+            pygame.display.flip()
+            self.full_redraws += 1
+            self.last_updated_area = self.screen_rect.width * self.screen_rect.height
+        elif len(dirty_rects) > 0:
+            pygame.display.update(dirty_rects)
+            self.partial_updates += 1
+        else:
+            self.skipped_updates += 1
+        
+        self.previous_rects = current_rects
+        self.needs_full_redraw = False
+
+    def stats(self):
+        return {
+            'full_redraws': self.full_redraws,
+            'partial_updates': self.partial_updates,
+            'skipped_updates': self.skipped_updates,
+            'last_updated_area': self.last_updated_area,
+        }
+
+class FrameProfiler():
+    def __init__(self, stages=PROFILER_STAGES, history=PROFILER_HISTORY):
+        self.stages = stages
+        self.stage_indices = {stage: index for index, stage in enumerate(stages)}
+        self.history = history
+
+        self.frame_times = np.zeros(history, dtype=np.float64)
+        self.stage_times = np.zeros((history, len(stages)), dtype=np.float64)
+        self.entity_counts = np.zeros(history, dtype=np.int64)
+        self.asset_loads = np.zeros(history, dtype=np.int64)
+        self.frame_count = 0
+
+        self.input_latencies = np.zeros(INPUT_LATENCY_HISTORY, dtype=np.float64)
+        self.input_count = 0
+        self.input_stamp_source = 'poll'
+
+        self.current_stage_times = [0.0] * len(stages)
+        self.frame_start = time.perf_counter()
+        self.last_lap = self.frame_start
+        self.disk_loads_before = ASSET_CACHE.disk_loads
+
+    def begin_frame(self):
+        self.current_stage_times = [0.0] * len(self.stages)
+        self.frame_start = time.perf_counter()
+        self.last_lap = self.frame_start
+        self.disk_loads_before = ASSET_CACHE.disk_loads
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.current_stage_times[self.stage_indices[stage]] += now - self.last_lap
+        self.last_lap = now
+
+    def end_frame(self, entities=0):
+        row = self.frame_count % self.history
+        self.frame_times[row] = time.perf_counter() - self.frame_start
+        self.stage_times[row] = self.current_stage_times
+        self.entity_counts[row] = entities
+        self.asset_loads[row] = ASSET_CACHE.disk_loads - self.disk_loads_before
+        self.frame_count += 1
+
+    def record_input_latency(self, timestamps, present_time=None, source='poll'):
+        if len(timestamps) > 0:
+            self.input_stamp_source = source
+        if present_time is None:
+            present_time = time.perf_counter()
+        for timestamp in timestamps:
+            self.input_latencies[self.input_count % INPUT_LATENCY_HISTORY] = present_time - timestamp
+            self.input_count += 1
+
+    def input_latency_summary(self):
+        latency_ms = self.input_latencies[:min(self.input_count, INPUT_LATENCY_HISTORY)] * 1000
+        if len(latency_ms) == 0:
+            return {'events': 0, 'source': self.input_stamp_source}
+        return {
+            'events': len(latency_ms),
+            'source': self.input_stamp_source,
+            'mean': float(latency_ms.mean()),
+            'p50': float(np.percentile(latency_ms, 50)),
+            'p95': float(np.percentile(latency_ms, 95)),
+            'p99': float(np.percentile(latency_ms, 99)),
+            'max': float(latency_ms.max()),
+        }
+
+    def _recorded_rows(self):
+        if self.frame_count < self.history:
+            return np.arange(self.frame_count)
+        return (np.arange(self.history) + self.frame_count) % self.history
+
+    def summary(self):
+        rows = self._recorded_rows()
+        if len(rows) == 0:
+            return {'frames': 0}
+
+        frame_ms = self.frame_times[rows] * 1000
+        stage_ms = self.stage_times[rows] * 1000
+        return {
+            'frames': len(rows),
+            'frame_ms': {
+                'mean': float(frame_ms.mean()),
+                'p50': float(np.percentile(frame_ms, 50)),
+                'p95': float(np.percentile(frame_ms, 95)),
+                'p99': float(np.percentile(frame_ms, 99)),
+                'max': float(frame_ms.max()),
+            },
+            'stage_ms': {stage: float(stage_ms[:, index].mean()) for index, stage in enumerate(self.stages)},
+            'entities': int(self.entity_counts[rows[-1]]),
+            'asset_loads': int(self.asset_loads[rows].sum()),
+            'input_latency_ms': self.input_latency_summary(),
+        }
+
+    def write_trace(self, path):
+        rows = self._recorded_rows()
+        first_frame = self.frame_count - len(rows)
+        frames = [
+            [first_frame + position, self.frame_times[row] * 1000] + (self.stage_times[row] * 1000).tolist() + [int(self.entity_counts[row]), int(self.asset_loads[row])]
+            for position, row in enumerate(rows.tolist())
+        ]
+        columns = ['frame', 'frame_ms'] + [f'{stage}_ms' for stage in self.stages] + ['entities', 'asset_loads']
+
+        with open(path, 'w') as file:
+            if path.endswith('.json'):
+                json.dump({'summary': self.summary(), 'columns': columns, 'frames': frames}, file)
+                return
+            
+            for key, value in self.summary().get('frame_ms', {}).items():
+                file.write(f'# {key}_frame_ms={value:.3f}\n')
+            input_ms = self.input_latency_summary()
+            for key, value in input_ms.items():
+                if key not in ('events', 'source'):
+                    file.write(f"# {key}_{input_ms['source']}_to_present_ms={value:.3f}\n")
+            file.write(','.join(columns) + '\n')
+            for frame in frames:
+                file.write(','.join(f'{value:.4f}' if isinstance(value, float) else str(value) for value in frame) + '\n')
+
+class ProfilerOverlay():
+    def __init__(self, profiler, pos=(20, 160), refresh=PROFILER_OVERLAY_REFRESH, col=pygame.Color('White')):
+        self.profiler = profiler
+        self.position = pos
+        self.refresh = refresh
+        self.color = col
+        self.visible = False
+
+        self.font = pygame.font.Font(None, 24)
+        self.surface = None
+        self.draw_rect = pygame.Rect(pos, (0, 0))
+        self.frames_since_render = refresh
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.frames_since_render = self.refresh
+
+    def _render(self):
+        summary = self.profiler.summary()
+        lines = [f"frames {summary['frames']}"]
+        if summary['frames'] > 0:
+            frame_ms = summary['frame_ms']
+            lines = [
+                f"frame {frame_ms['mean']:.2f} ms  p50 {frame_ms['p50']:.2f}  p95 {frame_ms['p95']:.2f}  p99 {frame_ms['p99']:.2f}  max {frame_ms['max']:.2f}",
+                f"entities {summary['entities']}  asset loads {summary['asset_loads']}",
+            ]
+            input_ms = summary['input_latency_ms']
+            if input_ms['events'] > 0:
+                lines.append(f"input {input_ms['source']}-to-present {input_ms['mean']:.2f} ms  p50 {input_ms['p50']:.2f}  p95 {input_ms['p95']:.2f}  p99 {input_ms['p99']:.2f}  max {input_ms['max']:.2f}")
+            lines = lines + [f'{stage} {stage_ms:.3f} ms' for stage, stage_ms in summary['stage_ms'].items()]
+
+        line_surfaces = [self.font.render(line, False, self.color, pygame.Color('Black')) for line in lines]
+        width = max(line.get_width() for line in line_surfaces)
+        height = sum(line.get_height() for line in line_surfaces)
+
+        self.surface = pygame.Surface((width, height))
+        y = 0
+        for line in line_surfaces:
+            self.surface.blit(line, (0, y))
+            y += line.get_height()
+        self.draw_rect = self.surface.get_rect(topleft=to_render_rect((self.position[0], self.position[1], 0, 0)).topleft)
+
+    def draw(self, screen):
+        if not self.visible:
+            return []
+        
+        if self.frames_since_render >= self.refresh:
+            self._render()
+            self.frames_since_render = 0
+        self.frames_since_render += 1
+
+        screen.blit(self.surface, self.draw_rect)
+        return [self.draw_rect.copy()]
+
+def measure_footprint(factory, count=MEMORY_REPORT_SAMPLES):
+    factory()
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [factory() for instance in range(0, count, 1)]
+    footprint = (tracemalloc.get_traced_memory()[0] - before - sys.getsizeof(instances)) / count
+    del instances
+
+    if not tracing:
+        tracemalloc.stop()
+    return footprint
+
+def find_live_surfaces():
+    surfaces = {}
+    for obj in gc.get_objects():
+        for referent in gc.get_referents(obj):
+            if isinstance(referent, pygame.Surface):
+                surfaces[id(referent)] = referent
+    
+    display = pygame.display.get_surface()
+    if display is not None:
+        surfaces[id(display)] = display
+    return list(surfaces.values())
+
+def surface_report(surfaces):
+    owned = [surface for surface in surfaces if surface.get_parent() is None]
+    return {
+        'live': len(surfaces),
+        'subsurfaces': len(surfaces) - len(owned),
+        'bytes': sum(surface.get_pitch() * surface.get_height() for surface in owned),
+    }
+
+def memory_report(world, samples=MEMORY_REPORT_SAMPLES):
+    blast_details = world.blasts[0].sprite_details if len(world.blasts) > 0 else (f'images\\gksr\\phase{world.gksr.attack_phase}\\blast\\', 8, 12)
+    rng = random.Random(0)
+    objects = {
+        'Player': (1, lambda: Player(hb=(60, 60))),
+        'GiantKillerSpaceRobot': (1, lambda: GiantKillerSpaceRobot(hb=(300, 750), po=8, aps=world.gksr.attack_phases)),
+        'PowerUp': (len(world.powerups), lambda: spawn_powerup((0, 0), rng)),
+        'Blast': (len(world.blasts), lambda: Blast(blast_details)),
+        'MeterBar': (3, lambda: MeterBar()),
+    }
+
+    entities = {}
+    for name, (count, factory) in objects.items():
+        footprint = measure_footprint(factory, samples)
+        entities[name] = {'count': count, 'bytes_per_entity': footprint, 'bytes': footprint * count}
+    
+    arrays = {
+        'player_projectiles': (len(world.player_projectiles), world.player_projectiles),
+        'gksr_projectiles': (len(world.gksr_projectiles), world.gksr_projectiles),
+        'stars': (world.stars.count, world.stars),
+    }
+    for name, (count, owner) in arrays.items():
+        nbytes = sum(value.nbytes for value in vars(owner).values() if isinstance(value, np.ndarray))
+        capacity = len(owner.pos_x)
+        entities[name] = {'count': count, 'bytes_per_entity': nbytes / capacity if capacity > 0 else 0.0, 'bytes': nbytes}
+
+    report = {
+        'entities': entities,
+        'surfaces': surface_report(find_live_surfaces()),
+        'asset_cache_entries': len(ASSET_CACHE.entries),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report['traced_bytes'] = current
+        report['peak_traced_bytes'] = peak
+    return report
+
+class KeyState():
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+class InputQueue():
+    def __init__(self, keys=INPUT_KEYS):
+        self.keys = frozenset(keys)
+        self.held = set()
+        self.queued = []
+        self.events = []
+        self.applied = []
+        self.stamp_source = 'poll'
+
+    def poll(self):
+        now = time.perf_counter()
+        ticks = pygame.time.get_ticks()
+        for event in pygame.event.get():
+            if event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key in self.keys:
+                self.queued.append((self._event_time(event, now, ticks), event.key, event.type == pygame.KEYDOWN))
+            else:
+                self.events.append(event)
+
+    def _event_time(self, event, now, ticks):
+        timestamp = getattr(event, 'timestamp', None)
+        if timestamp is None:
+            self.stamp_source = 'poll'
+            return now
+        self.stamp_source = 'event'
+        return now - (max(ticks - timestamp, 0) / 1000)
+
+    def take_events(self):
+        events = self.events
+        self.events = []
+        return events
+
+    def peek(self):
+        return KeyState(self.held.union(key for timestamp, key, down in self.queued if down))
+
+    def next_state(self):
+        pressed = set(self.held)
+        for timestamp, key, down in self.queued:
+            if down:
+                self.held.add(key)
+                pressed.add(key)
+            else:
+                self.held.discard(key)
+            self.applied.append(timestamp)
+        self.queued = []
+        return KeyState(pressed)
+
+    def take_applied(self):
+        applied = self.applied
+        self.applied = []
+        return applied
+
+class FramePacer():
+    def __init__(self, fps=60, busy_wait=False, margin=BUSY_WAIT_POLL_MARGIN):
+        self.fps = fps
+        self.busy_wait = busy_wait
+        self.margin = margin
+        self.clock = pygame.time.Clock()
+        self.deadline = time.perf_counter() + 1 / fps
+
+    def wait(self, input_queue=None):
+        if not self.busy_wait:
+            return self.clock.tick(self.fps) / 1000
+
+        while time.perf_counter() < self.deadline - self.margin:
+            if input_queue is not None:
+                input_queue.poll()
+        dt = self.clock.tick_busy_loop(self.fps) / 1000
+        self.deadline = time.perf_counter() + 1 / self.fps
+        return dt
+
 def update_player_from_keys(player, keys, dt=0):
     direction = None
     if keys[pygame.K_UP] and not keys[pygame.K_DOWN]:
@@ -431,190 +2076,633 @@ def update_player_from_keys(player, keys, dt=0):
 
 def player_shoot(player, player_projectiles):
     blast_details = ((f'images\\player\\blast\\', 6, 12), (0, 0), (1, 1))
-    player_projectiles.append(Projectile(('images\\player\\projectile\\', 3, 12), player.position_vector(), s=900, dir=1, dmg=1, bd=blast_details))
+    player_projectiles.spawn(('images\\player\\projectile\\', 3, 12), player.position_vector(), s=900, dir=1, dmg=1, bd=blast_details)
     player.time_since_last_shoot = 0
 
-def choose_random_gksr_projectiles_origins(gksr):
-    positions = []
-    while len(positions) < gksr.projectiles_per_wave:
-        pos = random.choice(gksr.projectile_origin_positions)
-        if not pos in positions:
-            positions.append(pos)
-    return positions
-
-def gksr_fire_projectile_wave(gksr, powerups_group, gksr_projectile_group):
-    positions = choose_random_gksr_projectiles_origins(gksr)
-
-    chance = gksr.powerup_drop_chance
-    random_num = random.randint(1, 100)
-    powerup_will_spawn = False
-    if random_num < chance:
-        powerup_will_spawn = True
-                
-    random_position_index = random.randint(0, len(positions)-1)
-
-    for index, position in enumerate(positions):
-        if index == random_position_index and powerup_will_spawn:
-            powerups_group.append(spawn_powerup(position))
-        else:
-            blast_details = ((f'images\\gksr\\phase{gksr.attack_phase}\\blast\\', 8, 12), (0, 0), (1, 1))
-            gksr_projectile_group.append(Projectile((f'images\\gksr\\phase{gksr.attack_phase}\\projectile\\', 3, 12), position, hb=(48, 48), s=750, dir=-1, dmg=1, bd=blast_details))
+def compile_attack_pattern(pattern, count=5, origin_count=10):
+    count = min(count, origin_count)
+    timeline = tuple((pattern['delay_step'] * slot, pattern['speed'] + (pattern['speed_step'] * slot), pattern['type']) for slot in range(0, count, 1))
+    return {'timeline': timeline, 'sorted': pattern['order'] == 'sorted'}
+
+def choose_gksr_projectile_origins(gksr, count, rng=random):
+    return rng.sample(range(0, len(gksr.projectile_origin_positions), 1), count)
+
+def spawn_gksr_attacks(gksr, powerups_group, gksr_projectile_group, rng=random):
+    for spawn_time, sequence, origin_index, speed, projectile_type, phase in gksr.pop_due_attacks():
+        position = gksr.projectile_origin_positions[origin_index]
+        if projectile_type == '':
+            powerups_group.append(spawn_powerup(position, rng))
+            continue
+        
+        details = GKSR_PROJECTILE_TYPES[projectile_type]
+        blast_details = ((f'images\\gksr\\phase{phase}\\blast\\', 8, 12), (0, 0), (1, 1))
+        gksr_projectile_group.spawn((f'images\\gksr\\phase{phase}\\projectile\\', 3, 12), position, hb=details['hb'], s=speed, dir=-1, dmg=details['dmg'], bd=blast_details)
+    return (powerups_group, gksr_projectile_group)
+
+def gksr_fire_projectile_wave(gksr, powerups_group, gksr_projectile_group, rng=random):
+    patterns = gksr.phase_patterns[gksr.attack_phase]
+    pattern = patterns[rng.randrange(len(patterns))] if len(patterns) > 1 else patterns[0]
+    origin_indices = choose_gksr_projectile_origins(gksr, len(pattern['timeline']), rng)
+    if pattern['sorted']:
+        origin_indices.sort()
+
+    powerup_roll = rng.randint(1, 100)
+    powerup_slot = rng.randrange(len(origin_indices))
+    if powerup_roll >= gksr.powerup_drop_chance:
+        powerup_slot = -1
+
+    gksr.schedule_attack(pattern['timeline'], origin_indices, powerup_slot)
     gksr.shoot_sound.play()
     gksr.time_since_last_shoot = 0
-    return (powerups_group, gksr_projectile_group)
+    return spawn_gksr_attacks(gksr, powerups_group, gksr_projectile_group, rng)
 
-def update_projectiles(projectiles, target, shooter, blasts, dt=0):
-    new_projectiles = []
-    for projectile in projectiles:
-        if projectile.onscreen:
-            projectile.update(dt)                    
-            if projectile.check_hit(target.hitbox_rect):
-                target.hitpoints -= projectile.damage
-                blast_details = projectile.blast_details
-                blasts.append(Blast(blast_details[0], projectile.position_vector(), blast_details[2]))
-                shooter.blast_sound.play()
-            else:
-                new_projectiles.append(projectile)
-    return (new_projectiles, blasts)
+def find_projectile_hits(projectiles, target, grid=None):
+    collision_rect = target.get_collision_rect()
+    if grid is not None:
+        grid.register_pool(projectiles)
+        hit_indices = grid.query(projectiles, collision_rect)
+    else:
+        hit_indices = projectiles.find_hits(collision_rect)
+    return target.find_pixel_hits(*projectiles.hitbox_bounds(hit_indices))
 
-def update_powerups(powerups, target, dt=0):
-    new_powerups = []
+def update_projectiles(projectiles, target, shooter, blasts, dt=0, grid=None):
+    projectiles.update(dt)
+
+    hit_indices = find_projectile_hits(projectiles, target, grid)
+    
+    for index in hit_indices:
+        target.hitpoints -= int(projectiles.damage[index])
+        blast_details = projectiles.blast_details(index)
+        blasts.append(Blast(blast_details[0], projectiles.position_vector(index), blast_details[2]))
+        shooter.blast_sound.play()
+    projectiles.release(hit_indices)
+    return (projectiles, blasts)
+
+def update_powerups(powerups, target, dt=0, grid=None):
+    kept_count = 0
     for powerup in powerups:
         if powerup.onscreen:
-            powerup.update(dt)                    
-            if powerup.check_hit(target.hitbox_rect) and target.active_powerup == 0:
-                target.active_powerup = powerup.code
-                target.powerup_effect_duration = powerup.duration
-                target.powerup_sound.play()
-            else:
-                new_powerups.append(powerup)
-    return new_powerups
+            powerup.update(dt)
+            powerups[kept_count] = powerup
+            kept_count += 1
+    del powerups[kept_count:]
+
+    if grid is not None:
+        grid.register_objects(powerups)
+        hit_indices = grid.query(powerups, target.hitbox_rect)
+    else:
+        hit_indices = [index for index, powerup in enumerate(powerups) if powerup.check_hit(target.hitbox_rect)]
+
+    if len(hit_indices) > 0 and target.active_powerup == 0:
+        powerup = powerups.pop(int(hit_indices[0]))
+        target.active_powerup = powerup.code
+        target.powerup_effect_duration = powerup.duration
+        target.powerup_sound.play()
+    return powerups
 
-def spawn_powerup(position):
+def spawn_powerup(position, rng=random):
     base_path = 'images\\powerups\\'
-    random_num = random.randint(1,3)
+    random_num = rng.randint(1,3)
     return PowerUp((f'{base_path}{random_num}\\', 3, 12), position, s=300, c=random_num)
 
 def update_blasts(blasts, dt=0):
-    new_blasts = []
+    kept_count = 0
     for blast in blasts:
         blast.update(dt)
         if not blast.should_die():
-            new_blasts.append(blast)
-    return new_blasts
-
-def generate_star(x_range=(0, DISPLAY_WIDTH), y_range=(0, DISPLAY_HEIGHT), x_limit=DISPLAY_WIDTH+50):
-    position = (random.randint(x_range[0], x_range[1]), random.randint(y_range[0], y_range[1]))
-    color = pygame.Color('White') #pygame.Color(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-
-    random_num = random.randint(1, 3)
-
-    STAR_SIZE_CONSTANT = 3
-    size = STAR_SIZE_CONSTANT #* random_num
-
-    #STAR_SPEED_CONSTANT = 100
-    speed = random.randint(100, 400) #STAR_SPEED_CONSTANT * random_num
-
-    sprite_details = ('', (size, size), color)
-
-    return Star(sprite_details, position, s=speed, dir=1, x_lim=x_limit)
+            blasts[kept_count] = blast
+            kept_count += 1
+    del blasts[kept_count:]
+    return blasts
 
 def update_stars(stars, dt=0):
-    stars_removed = 0
-
-    new_stars = []
-    for star in stars:
-        if star.onscreen:
-            star.update(dt)                    
-            new_stars.append(star)
+    stars.update(dt)
+    return stars
+
+def merge_balance(overrides=None):
+    balance = dict(DEFAULT_BALANCE)
+    balance['gksr_attack_phases'] = {phase: dict(details) for phase, details in GKSR_ATTACK_PHASES.items()}
+    if overrides is None:
+        return balance
+    
+    for key, value in overrides.items():
+        if key == 'gksr_attack_phases':
+            for phase, details in value.items():
+                balance['gksr_attack_phases'][int(phase)].update(details)
+        elif key in balance:
+            balance[key] = value
         else:
-            stars_removed += 1
+            raise KeyError(f'unknown balance parameter: {key}')
+    return balance
+
+class FixedStepper():
+    def __init__(self, rate=SIMULATION_RATE, max_steps=MAX_CATCH_UP_STEPS):
+        self.step_dt = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.alpha = 1.0
+        self.dropped_time = 0.0
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.alpha = 1.0
+        self.dropped_time = 0.0
+
+    def advance(self, frame_dt):
+        self.accumulator += frame_dt
+        steps = int(self.accumulator / self.step_dt)
+        if steps > self.max_steps:
+            self.dropped_time += (steps - self.max_steps) * self.step_dt
+            steps = self.max_steps
+        self.accumulator = self.accumulator % self.step_dt
+        self.alpha = self.accumulator / self.step_dt
+        return steps
+
+class GameWorld():
+    def __init__(self, star_count=300, time_limit=70.0, rng=None, balance=None, profiler=None, collision_mode=COLLISION_MODE):
+        self.rng = rng if rng is not None else random.Random()
+        self.profiler = profiler if profiler is not None else FrameProfiler(history=1)
+        self.balance = merge_balance(balance)
+        self.animation_clock = ANIMATION_CLOCK
+        self.animation_clock.reset()
+        self.sound_manager = SOUND_MANAGER
+
+        self.player = Player(pos=(150, 630), lim=(315, 945), hb=(60, 60), hp=self.balance['player_hitpoints'], s=self.balance['player_speed'], cdt=self.balance['player_shoot_cooldown_time'])
+        self.player_projectiles = ProjectilePool()
+
+        self.gksr = GiantKillerSpaceRobot(pos=(1575, 630), lim=(270, 910), hb=(300, 750), hp=self.balance['gksr_hitpoints'], po=8, aps=self.balance['gksr_attack_phases'])
+        self.gksr_projectiles = ProjectilePool()
+
+        self.powerups = []
+        self.blasts = []
+        self.set_collision_mode(collision_mode)
+
+        self.stars = StarField(star_count, seed=self.rng.getrandbits(32))
+        self.collision_grid = CollisionGrid()
+
+        self.time_limit = time_limit
+        self.time_left = time_limit
+        self.time_bar = MeterBar(pos=(960, 30), dims=(750, 30), sm=2, col='Purple', amt=time_limit)
+        self.powerup_indicator = PowerUpIndicator((425, 90))
+        self.ui_bar = Sprite(path='images\\ui_bar.png', pos=(DISPLAY_WIDTH/2, 90))
+        self.hud = HudLayer((self.ui_bar, self.time_bar, self.powerup_indicator, self.player.hitpoints_bar, self.gksr.hitpoints_bar))
+        self.sprite_batch = SpriteBatch()
+
+        self.game_end_scenario = 0
+        self.ticks = 0
+        self.shots_fired = 0
+        self.hits_taken = 0
+
+    def set_collision_mode(self, mode=COLLISION_MODE):
+        self.collision_mode = mode
+        self.player.set_collision_mode(mode)
+        self.gksr.set_collision_mode(mode)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.animation_clock.reset()
+        self.sound_manager.stop_all()
+
+        self.player.reset()
+        self.player_projectiles.clear()
+
+        self.gksr.reset()
+        self.gksr_projectiles.clear()
+
+        self.powerups.clear()
+        self.blasts.clear()
+
+        self.stars.reset(seed=self.rng.getrandbits(32))
+
+        self.time_left = self.time_limit
+        self.time_bar.update(self.time_left)
+        self.powerup_indicator.update(0)
+
+        self.game_end_scenario = 0
+        self.ticks = 0
+        self.shots_fired = 0
+        self.hits_taken = 0
+
+    def snapshot(self):
+        return {
+            'rng': self.rng.getstate(),
+            'animation_time': self.animation_clock.time,
+            'player': self.player.get_state(),
+            'player_projectiles': self.player_projectiles.get_state(),
+            'gksr': self.gksr.get_state(),
+            'gksr_projectiles': self.gksr_projectiles.get_state(),
+            'powerups': [powerup.get_state() for powerup in self.powerups],
+            'blasts': [blast.get_state() for blast in self.blasts],
+            'stars': self.stars.get_state(),
+            'time_left': self.time_left,
+            'game_end_scenario': self.game_end_scenario,
+            'ticks': self.ticks,
+            'shots_fired': self.shots_fired,
+            'hits_taken': self.hits_taken,
+        }
+
+    def restore(self, snapshot):
+        self.rng.setstate(to_tuples(snapshot['rng']))
+        self.animation_clock.reset(snapshot['animation_time'])
+        self.player.set_state(snapshot['player'])
+        self.player_projectiles.set_state(snapshot['player_projectiles'])
+        self.gksr.set_state(snapshot['gksr'])
+        self.gksr_projectiles.set_state(snapshot['gksr_projectiles'])
+
+        self.powerups[:] = [PowerUp.from_state(state) for state in snapshot['powerups']]
+        self.blasts[:] = [Blast.from_state(state) for state in snapshot['blasts']]
+        self.stars.set_state(snapshot['stars'])
+
+        self.time_left = snapshot['time_left']
+        self.time_bar.update(self.time_left)
+        self.powerup_indicator.update(self.player.active_powerup)
+
+        self.game_end_scenario = snapshot['game_end_scenario']
+        self.ticks = snapshot['ticks']
+        self.shots_fired = snapshot['shots_fired']
+        self.hits_taken = snapshot['hits_taken']
+
+    def set_attack_phase(self, phase):
+        self.gksr.set_attack_phase(phase)
+
+    def state_hash(self):
+        return hashlib.sha256(json.dumps(self.snapshot(), sort_keys=True).encode()).hexdigest()
+
+    def step(self, keys, dt=0):
+        player = self.player
+        gksr = self.gksr
+
+        profiler = self.profiler
+
+        direction = update_player_from_keys(player, keys, dt)
+        if keys[pygame.K_SPACE] and player.can_shoot() and direction == 0:
+            player.shoot_sound.play()
+            player_shoot(player, self.player_projectiles)
+            self.shots_fired += 1
+        profiler.lap('input')
+        
+        gksr.update(dt)
+        if gksr.can_shoot():
+            self.powerups, self.gksr_projectiles = gksr_fire_projectile_wave(gksr, self.powerups, self.gksr_projectiles, self.rng)
+        else:
+            self.powerups, self.gksr_projectiles = spawn_gksr_attacks(gksr, self.powerups, self.gksr_projectiles, self.rng)
+        profiler.lap('update_gksr')
+
+        self.collision_grid.begin_frame()
+        self.player_projectiles, self.blasts = update_projectiles(self.player_projectiles, gksr, player, self.blasts, dt, self.collision_grid)
+
+        hitpoints_before = player.hitpoints
+        self.gksr_projectiles, self.blasts = update_projectiles(self.gksr_projectiles, player, gksr, self.blasts, dt, self.collision_grid)
+        self.hits_taken += hitpoints_before - player.hitpoints
+        profiler.lap('update_projectiles')
+
+        self.powerups = update_powerups(self.powerups, player, dt)
+        profiler.lap('update_powerups')
+        self.blasts = update_blasts(self.blasts, dt)
+        profiler.lap('update_blasts')
+
+        self.stars = update_stars(self.stars, dt)
+        profiler.lap('update_stars')
+
+        self.animation_clock.advance(dt)
+        self.time_left -= dt
+        self.ticks += 1
+
+        if gksr.hitpoints <= 0:
+            self.game_end_scenario = 1
+        elif player.hitpoints <= 0:
+            self.game_end_scenario = 2
+        elif self.time_left <= 0:
+            self.game_end_scenario = 3
+        
+        return self.game_end_scenario
+
+    def draw(self, screen, alpha=1.0):
+        self.time_bar.update(self.time_left)
+        self.powerup_indicator.update(self.player.active_powerup)
+
+        self.stars.draw(screen, alpha)
+        dirty_rects = self.stars.get_dirty_rects(alpha=alpha)
+
+        self.hud.submit(self.sprite_batch, LAYER_HUD)
+        self.gksr.submit(self.sprite_batch, LAYER_CHARACTERS, alpha)
+        self.player.submit(self.sprite_batch, LAYER_CHARACTERS, alpha)
+        self.player_projectiles.submit(self.sprite_batch, LAYER_PROJECTILES, alpha)
+        self.gksr_projectiles.submit(self.sprite_batch, LAYER_PROJECTILES, alpha)
+
+        for powerup in self.powerups:
+            powerup.submit(self.sprite_batch, LAYER_POWERUPS, alpha)
+
+        for blast in self.blasts:
+            blast.submit(self.sprite_batch, LAYER_BLASTS)
+
+        dirty_rects.extend(self.sprite_batch.flush(screen))
+        self.profiler.lap('draw')
+        return dirty_rects
+
+    def entity_count(self):
+        return 2 + len(self.player_projectiles) + len(self.gksr_projectiles) + len(self.powerups) + len(self.blasts)
+
+    def stats(self):
+        return {
+            'winner': GAME_END_WINNERS.get(self.game_end_scenario),
+            'game_end_scenario': self.game_end_scenario,
+            'time_left': max(self.time_left, 0.0),
+            'hits_taken': self.hits_taken,
+            'shots_fired': self.shots_fired,
+            'player_hitpoints': self.player.hitpoints,
+            'gksr_hitpoints': self.gksr.hitpoints,
+            'ticks': self.ticks,
+        }
+
+def to_tuples(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(to_tuples(item) for item in value)
+    return value
+
+def save_snapshot(snapshot, path):
+    with open(path, 'w') as file:
+        json.dump(snapshot, file)
+
+def load_snapshot(path):
+    with open(path) as file:
+        return json.load(file)
+
+def encode_keys(keys):
+    bits = 0
+    for bit, key in enumerate(REPLAY_KEYS):
+        if keys[key]:
+            bits |= 1 << bit
+    return bits
+
+def decode_keys(bits):
+    return KeyState(key for bit, key in enumerate(REPLAY_KEYS) if bits & (1 << bit))
+
+class ReplayLog():
+    def __init__(self, seed=0, star_count=300, time_limit=70.0, snapshot=None, step_dt=SIMULATION_STEP):
+        self.seed = seed
+        self.star_count = star_count
+        self.time_limit = time_limit
+        self.snapshot = snapshot
+        self.step_dt = step_dt
+        self.final_hash = ''
+
+        self.frames = np.zeros(0, dtype=REPLAY_FRAME)
+        self.pending_frames = []
+
+    def __len__(self):
+        return len(self.frames) + len(self.pending_frames)
+
+    def record(self, keys):
+        bits = encode_keys(keys)
+        self.pending_frames.append(bits)
+        return decode_keys(bits)
+
+    def finish(self, world):
+        self.final_hash = world.state_hash()
+
+    def get_frames(self):
+        if len(self.pending_frames) > 0:
+            self.frames = np.concatenate((self.frames, np.array(self.pending_frames, dtype=REPLAY_FRAME)))
+            self.pending_frames = []
+        return self.frames
+
+    def create_world(self, profiler=None):
+        world = GameWorld(self.star_count, self.time_limit, profiler=profiler)
+        world.reset(self.seed)
+        if self.snapshot is not None:
+            world.restore(self.snapshot)
+        return world
+
+    def save(self, path):
+        frames = self.get_frames()
+        snapshot = json.dumps(self.snapshot).encode() if self.snapshot is not None else b''
+        final_hash = self.final_hash.encode()
+        with open(path, 'wb') as file:
+            file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.star_count, self.time_limit, self.step_dt, self.seed, len(snapshot)))
+            file.write(snapshot)
+            file.write(struct.pack('<B', len(final_hash)) + final_hash)
+            file.write(struct.pack('<I', len(frames)))
+            file.write(frames.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        
+        magic, version, star_count, time_limit, step_dt, seed, snapshot_length = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f'{path} is not a version {REPLAY_VERSION} replay log')
+        offset = REPLAY_HEADER.size
+
+        snapshot = json.loads(data[offset:offset+snapshot_length]) if snapshot_length > 0 else None
+        offset += snapshot_length
+        hash_length = data[offset]
+        final_hash = data[offset+1:offset+1+hash_length].decode()
+        offset += 1 + hash_length
+        frame_count = struct.unpack_from('<I', data, offset)[0]
+        offset += 4
+
+        log = cls(seed, star_count, time_limit, snapshot, step_dt)
+        log.final_hash = final_hash
+        log.frames = np.frombuffer(data, dtype=REPLAY_FRAME, count=frame_count, offset=offset)
+        return log
+
+class Replayer():
+    def __init__(self, log, ci=REPLAY_CHECKPOINT_INTERVAL, profiler=None):
+        self.log = log
+        self.frames = log.get_frames()
+        self.key_states = [decode_keys(bits) for bits in range(0, 1 << len(REPLAY_KEYS), 1)]
+        self.key_bits = self.frames.tolist()
+
+        self.world = log.create_world(profiler)
+        self.frame = 0
+        self.checkpoint_interval = ci
+        self.checkpoints = {0: self.world.snapshot()}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def is_done(self):
+        return self.frame >= len(self.frames)
+
+    def step(self):
+        self.world.step(self.key_states[self.key_bits[self.frame]], self.log.step_dt)
+        self.frame += 1
+        if self.frame % self.checkpoint_interval == 0 and self.frame not in self.checkpoints:
+            self.checkpoints[self.frame] = self.world.snapshot()
+        return self.world.game_end_scenario
+
+    def seek(self, frame):
+        frame = max(0, min(frame, len(self.frames)))
+        if not self.frame <= frame < self.frame + self.checkpoint_interval:
+            checkpoint = max(checkpoint for checkpoint in self.checkpoints if checkpoint <= frame)
+            if checkpoint > self.frame or frame < self.frame:
+                self.world.restore(self.checkpoints[checkpoint])
+                self.frame = checkpoint
+        
+        while self.frame < frame:
+            self.step()
+
+    def run(self, screen=None):
+        while not self.is_done():
+            self.step()
+            if screen is not None:
+                self.world.draw(screen)
+        return self.world
+
+    def matches_recording(self):
+        return self.log.final_hash != '' and self.is_done() and self.world.state_hash() == self.log.final_hash
+
+def scripted_input(script):
+    def next_keys(world):
+        if world.ticks < len(script):
+            return script[world.ticks]
+        return KeyState()
+    return next_keys
+
+def dodging_bot(world, lookahead=600, margin=15):
+    player = world.player
+    half_height = player.hitbox_rect.height / 2
+    live_indices, left, top, right, bottom = world.gksr_projectiles.hitbox_bounds()
+
+    incoming = (right > player.hitbox_rect.left - margin) & (left < player.hitbox_rect.right + lookahead)
+    danger_top = top[incoming] - margin
+    danger_bottom = bottom[incoming] + margin
+
+    candidate_ys = np.arange(player.y_range[0] + half_height + 5, player.y_range[1] - half_height - 5, 10)
+    candidate_ys = np.append(candidate_ys, player.pos_y)
+    blocked = (danger_top[None, :] < candidate_ys[:, None] + half_height) & (danger_bottom[None, :] > candidate_ys[:, None] - half_height)
+    safe_ys = candidate_ys[~blocked.any(axis=1)]
+
+    if len(safe_ys) == 0 or safe_ys[-1] == player.pos_y:
+        return KeyState((pygame.K_SPACE,))
+
+    target_y = safe_ys[np.argmin(np.abs(safe_ys - player.pos_y))]
+    if target_y > player.pos_y:
+        return KeyState((pygame.K_DOWN,))
+    return KeyState((pygame.K_UP,))
+
+def init_headless():
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    os.environ['SDL_NO_SIGNAL_HANDLERS'] = '1'
+
+    pygame.init()
+    pygame.mixer.init()
+    pygame.display.set_mode((1, 1))
+    ASSET_CACHE.load_atlas()
+    preloader = AssetPreloader()
+    preloader.start()
+    preloader.wait()
+
+def run_headless_simulation(seed=None, bot=dodging_bot, dt=SIMULATION_STEP, max_ticks=None, time_limit=70.0, balance=None):
+    if not pygame.display.get_init() or pygame.display.get_surface() is None:
+        init_headless()
+
+    world = GameWorld(star_count=0, time_limit=time_limit, rng=random.Random(seed), balance=balance)
+    while world.game_end_scenario == 0:
+        if max_ticks is not None and world.ticks >= max_ticks:
+            break
+        world.step(bot(world), dt)
     
-    for number in range(0, stars_removed, 1):
-        new_stars.append(generate_star(x_range=(-64, -16)))
+    stats = world.stats()
+    stats['seed'] = seed
+    return stats
 
-    return new_stars
+def load_end_screens(pos=(DISPLAY_WIDTH/2, DISPLAY_HEIGHT/2), scenarios=(1, 2, 3)):
+    return {scenario: Sprite(path=f'images\\endings\\game_end_{scenario}.png', pos=pos) for scenario in scenarios}
 
-def main():
+def main(snapshot_path=None, trace_path=None, record_path=None, render_divisor=1, memory_path=None, busy_wait=False, snapshot_save_path=SNAPSHOT_SAVE_PATH):
     FRAMES_PER_SECOND = 60
+    if memory_path is not None:
+        tracemalloc.start()
     
     pygame.init()
     pygame.display.set_caption('Impending Doom')
 
     pygame.mixer.init()
-    pygame.mixer.music.load('sounds\\background_music.mp3')
-
-    screen = pygame.display.set_mode((DISPLAY_WIDTH, DISPLAY_HEIGHT))
-
-    clock = pygame.time.Clock()
-    delta_time = 0
-
-    player = Player(pos=(150, 630), lim=(345, 960), hp=5)
-    player_projectiles = []
+    pygame.mixer.music.load(resolve_asset_path('sounds\\background_music.mp3'))
 
-    gksr = GiantKillerSpaceRobot(pos=(1575, 630), lim=(270, 1020), hb=(300, 750))
-    gksr_projectiles = []
+    configure_render_scale(render_divisor)
+    screen = pygame.display.set_mode(render_size(), pygame.SCALED if render_divisor != 1 else 0)
 
-    powerup_pickups = []
-    blasts = []
+    ASSET_CACHE.load_atlas()
+    preloader = AssetPreloader()
+    preloader.start()
 
-    star_count = 300
-    stars = []
+    pacer = FramePacer(FRAMES_PER_SECOND, busy_wait)
+    input_queue = InputQueue()
+    stepper = FixedStepper()
+    steps = 0
 
-    time_left = 70.0
-    time_bar = MeterBar(pos=(960, 30), dims=(750, 30), sm=2, col='Purple', amt=time_left)
-
-    powerup_indicator = PowerUpIndicator((70, 70))
-
-    powerup_pickups = []
+    world = None
+    snapshot = load_snapshot(snapshot_path) if snapshot_path is not None else None
+    replay_log = None
+    fights = 0
 
     game_phase = 1
-    game_end_scenario = 0
 
     center_vector = (DISPLAY_WIDTH/2, DISPLAY_HEIGHT/2)
 
     title_screen = Sprite(path='images\\title.png', pos=center_vector)
-    end_screen = Sprite(path='')
+    end_screens = None
+
+    loading_bar = MeterBar(pos=(DISPLAY_WIDTH/2 - 300, DISPLAY_HEIGHT - 120), dims=(600, 20), sm=0, col='White', amt=max(len(preloader.paths), 1))
+    loading_bar.update(0)
 
-    ui_bar = Sprite(path='images\\ui_bar.png', pos=(center_vector[0], 90))
+    renderer = DirtyRectRenderer(screen)
+    renderer.set_background(drawables=(title_screen,))
+
+    profiler = FrameProfiler()
+    profiler_overlay = ProfilerOverlay(profiler)
 
     running = True
     while running:
-        for event in pygame.event.get():
+        profiler.begin_frame()
+        input_queue.poll()
+        for event in input_queue.take_events():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler_overlay.toggle()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5 and game_phase == 3:
+                save_snapshot(world.snapshot(), snapshot_save_path)
         
-        keys = pygame.key.get_pressed()
+        keys = input_queue.peek() if game_phase == 3 else input_queue.next_state()
         if keys[pygame.K_BACKSPACE] or keys[pygame.K_ESCAPE]:
             running = False
+        profiler.lap('input')
         
-        if game_phase == 1:
-            title_screen.draw(screen)
+        renderer.begin_frame()
+        dirty_rects = []
 
-            if keys[pygame.K_SPACE]:
+        if game_phase == 1:
+            if not preloader.is_done():
+                preloader.poll()
+                if not preloader.is_done():
+                    loading_bar.update(preloader.loaded_count)
+                    loading_bar.draw(screen)
+                    dirty_rects = loading_bar.get_dirty_rects()
+            elif keys[pygame.K_SPACE]:
+                end_screens = load_end_screens(center_vector)
                 game_phase += 1
         elif game_phase == 2:
-            player = Player(pos=(150, 630), lim=(315, 945), hb=(60, 60), hp=5)
-            player_projectiles = []
-
-            gksr = GiantKillerSpaceRobot(pos=(1575, 630), lim=(270, 910), hb=(300, 750), hp=140, po=8)
-            gksr_projectiles = []
-
-            powerups = []
-            blasts = []
-
-            stars = []
-            for num in range(0, star_count, 1):
-                stars.append(generate_star())
-
-            game_end_scenario = 0
+            if world is None:
+                world = GameWorld(profiler=profiler)
             
-            time_left = 70.0
-            time_bar = MeterBar(pos=(960, 30), dims=(750, 30), sm=2, col='Purple', amt=time_left)
-
-            powerup_indicator = PowerUpIndicator((425, 90))
+            seed = random.getrandbits(63)
+            world.reset(seed)
+            if snapshot is not None:
+                world.restore(snapshot)
+            
+            fights += 1
+            if record_path is not None:
+                replay_log = ReplayLog(seed, len(world.stars.pos_x), world.time_limit, snapshot, stepper.step_dt)
+            stepper.reset()
+            renderer.set_background(BACKGROUND_COLOR)
 
-            end_screen = Sprite(path='') 
             game_phase +=1
         elif game_phase == 3:
             if not pygame.mixer.music.get_busy():
@@ -622,77 +2710,61 @@ def main():
                 pygame.mixer.music.set_volume(0.5)
                 pygame.mixer.music.play()
 
-            time_bar.update(time_left)
-
-            direction = update_player_from_keys(player, keys, delta_time)
-            if keys[pygame.K_SPACE] and player.can_shoot() and direction == 0:
-                player.shoot_sound.play()
-                player_shoot(player, player_projectiles)
-            
-            powerup_indicator.update(player.active_powerup)
-        
-            gksr.update(delta_time)
-            if gksr.can_shoot():
-                powerups, gksr_projectiles = gksr_fire_projectile_wave(gksr, powerups, gksr_projectiles)
-
-            player_projectiles, blasts = update_projectiles(player_projectiles, gksr, player, blasts, delta_time)
-            gksr_projectiles, blasts = update_projectiles(gksr_projectiles, player, gksr, blasts, delta_time)
-
-            powerups = update_powerups(powerups, player, delta_time)
-            blasts = update_blasts(blasts, delta_time)
-
-            stars = update_stars(stars, delta_time)
-
-            screen.fill(pygame.Color(32, 0, 54))
-
-            for star in stars:
-                star.draw(screen)
-            
-            ui_bar.draw(screen)
-
-            time_bar.draw(screen)
-            
-            powerup_indicator.draw(screen)
+            for step in range(0, steps, 1):
+                keys = input_queue.next_state()
+                if replay_log is not None:
+                    keys = replay_log.record(keys)
+                if world.step(keys, stepper.step_dt) != 0:
+                    break
+            world.sound_manager.flush()
+            dirty_rects = world.draw(screen, stepper.alpha)
             
-            gksr.draw(screen)
-            player.draw(screen)
-
-            for projectile in player_projectiles:
-                projectile.draw(screen)
-        
-            for projectile in gksr_projectiles:
-                projectile.draw(screen)
-            
-            for powerup in powerups:
-                powerup.draw(screen)
-
-            for blast in blasts:
-                blast.draw(screen)
-
-            time_left -= delta_time
-            
-            if gksr.hitpoints <= 0:
-                game_end_scenario = 1
-            elif player.hitpoints <= 0:
-                game_end_scenario = 2
-            elif time_left <= 0:
-                game_end_scenario = 3
-            
-            if game_end_scenario != 0:
+            if world.game_end_scenario != 0:
+                if replay_log is not None:
+                    replay_log.finish(world)
+                    replay_log.save(record_path.format(fight=fights))
+                    replay_log = None
+                world.sound_manager.stop_all()
+                renderer.set_background(drawables=(end_screens[world.game_end_scenario],))
                 game_phase += 1
         else:
             if pygame.mixer.music.get_busy():
                 pygame.mixer.music.stop()
-            
-            end_screen = Sprite(path=f'images\\endings\\game_end_{game_end_scenario}.png', pos=center_vector)
-            end_screen.draw(screen)
 
             if keys[pygame.K_RSHIFT]:
                 game_phase = 2
+        profiler.lap('draw')
 
-        pygame.display.flip()
-        delta_time = clock.tick(FRAMES_PER_SECOND) / 1000
+        dirty_rects = dirty_rects + profiler_overlay.draw(screen)
+        profiler.lap('overlay')
+
+        renderer.present(dirty_rects)
+        profiler.lap('present')
+        profiler.record_input_latency(input_queue.take_applied(), source=input_queue.stamp_source)
+        profiler.end_frame(world.entity_count() if game_phase == 3 else 0)
+
+        if trace_path is not None and profiler.frame_count % profiler.history == 0:
+            profiler.write_trace(trace_path)
+        steps = stepper.advance(pacer.wait(input_queue))
+    
+    if trace_path is not None:
+        profiler.write_trace(trace_path)
+    if replay_log is not None:
+        replay_log.finish(world)
+        replay_log.save(record_path.format(fight=fights))
+    if memory_path is not None and world is not None:
+        with open(memory_path, 'w') as file:
+            json.dump(memory_report(world), file, indent=2)
     pygame.quit()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Play Impending Doom.')
+    parser.add_argument('snapshot', nargs='?', help='JSON world snapshot to start every fight from')
+    parser.add_argument('--trace', help='write a rolling frame-time trace to this .csv or .json file (F3 toggles the overlay)')
+    parser.add_argument('--record', help='record every fight to this replay log; {fight} in the path is replaced by the fight number')
+    parser.add_argument('--render-divisor', type=int, default=1, help='render at 1/N of 1920x1080 and upscale the window (3 renders sprites at their native size)')
+    parser.add_argument('--memory-report', help='trace allocations and write a per-entity memory report to this JSON file on exit')
+    parser.add_argument('--busy-wait', action='store_true', help='pace frames by spinning instead of sleeping, polling input while waiting')
+    parser.add_argument('--save-snapshot', default=SNAPSHOT_SAVE_PATH, help='file F5 writes the current fight to, to be passed back as the snapshot argument')
+    args = parser.parse_args()
+    main(args.snapshot, args.trace, args.record, args.render_divisor, args.memory_report, args.busy_wait, args.save_snapshot)
\ No newline at end of file
@@ -0,0 +1,43 @@
+import argparse
+import json
+import sys
+import time
+
+import project
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a recorded fight through the simulation as fast as possible.')
+    parser.add_argument('log', help='replay log written by project.py --record')
+    parser.add_argument('--render', action='store_true', help='draw every frame to an offscreen surface as well')
+    parser.add_argument('--seek', type=int, help='stop at this frame and print its state hash instead of replaying to the end')
+    parser.add_argument('--checkpoint-interval', type=int, default=project.REPLAY_CHECKPOINT_INTERVAL, help='frames between state checkpoints used for seeking')
+    args = parser.parse_args(argv)
+
+    project.init_headless()
+    log = project.ReplayLog.load(args.log)
+    replayer = project.Replayer(log, args.checkpoint_interval)
+    screen = project.pygame.Surface((project.DISPLAY_WIDTH, project.DISPLAY_HEIGHT), 0, 32) if args.render else None
+
+    start = time.perf_counter()
+    if args.seek is not None:
+        replayer.seek(args.seek)
+    else:
+        replayer.run(screen)
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'frames': replayer.frame,
+        'recorded_frames': len(replayer),
+        'seconds': elapsed,
+        'frames_per_second': replayer.frame / elapsed if elapsed > 0 else 0.0,
+        'state_hash': replayer.world.state_hash(),
+        'game_end_scenario': replayer.world.game_end_scenario,
+    }
+    if args.seek is None:
+        result['matches_recording'] = replayer.matches_recording()
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 0 if args.seek is not None or result['matches_recording'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import project
+
+VECTOR_ACTIONS = ('noop', 'up', 'down', 'shoot')
+VECTOR_REWARDS = {'hit': 1.0, 'hurt': -1.0, 'win': 10.0, 'lose': -10.0}
+
+PLAYER_POSITION = (150, 630)
+PLAYER_LIMITS = (315, 945)
+PLAYER_HITBOX = (60, 60)
+PLAYER_PROJECTILE_SPEED = 900
+PLAYER_PROJECTILE_HITBOX = (20, 20)
+
+GKSR_POSITION = (1575, 630)
+GKSR_HITBOX = (300, 750)
+GKSR_FIRING_RANGE = (270, 910)
+GKSR_ORIGIN_X = 1350
+GKSR_ORIGINS = 8
+GKSR_PROJECTILE_SPEED = 750
+GKSR_PROJECTILE_HITBOX = (48, 48)
+
+PROJECTILE_DRAW_SIZE = 96
+
+def _hash_uniform(seeds, counters, lanes):
+    z = (seeds * np.uint64(0x9E3779B97F4A7C15)) + (counters * np.uint64(GKSR_ORIGINS)) + lanes
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)) * (1.0 / (1 << 53))
+
+def _ring_slots(distance, speed, interval, dt):
+    lifetime_steps = int(np.ceil(distance / (speed * dt))) + 1
+    interval_steps = max(int(interval / dt), 1)
+    return int(np.ceil(lifetime_steps / interval_steps)) + 1
+
+class VectorEnv():
+    def __init__(self, n=1024, dt=project.SIMULATION_STEP, time_limit=70.0, balance=None, auto_reset=True):
+        self.num_envs = n
+        self.dt = dt
+        self.time_limit = time_limit
+        self.balance = project.merge_balance(balance)
+        self.auto_reset = auto_reset
+
+        phases = [self.balance['gksr_attack_phases'][phase] for phase in sorted(self.balance['gksr_attack_phases'])]
+        self.phase_thresholds = np.array([details['health_percent'] for details in phases] + [-1.0], dtype=np.float64)
+        self.phase_wave_sizes = np.array([min(details['projectiles_per_wave'], GKSR_ORIGINS) for details in phases], dtype=np.int64)
+        self.phase_cooldowns = np.array([details['cooldown_time'] for details in phases], dtype=np.float64)
+
+        step = (GKSR_FIRING_RANGE[1] - GKSR_FIRING_RANGE[0]) / GKSR_ORIGINS
+        self.lane_y = np.array([GKSR_FIRING_RANGE[0] + (step * (lane + 1)) for lane in range(0, GKSR_ORIGINS, 1)], dtype=np.float64)
+        self.lane_ids = np.arange(GKSR_ORIGINS, dtype=np.uint64)
+        self.observation_size = 6 + GKSR_ORIGINS
+
+        self.player_slots = _ring_slots(project.DISPLAY_WIDTH + (PROJECTILE_DRAW_SIZE / 2) - PLAYER_POSITION[0], PLAYER_PROJECTILE_SPEED, self.balance['player_shoot_cooldown_time'], dt)
+        self.lane_slots = _ring_slots(GKSR_ORIGIN_X + (PROJECTILE_DRAW_SIZE / 2), GKSR_PROJECTILE_SPEED, self.phase_cooldowns.min(), dt)
+
+        self.seeds = np.zeros(n, dtype=np.uint64)
+        self.episode_index = np.zeros(n, dtype=np.uint64)
+        self.player_y = np.zeros(n, dtype=np.float64)
+        self.player_hp = np.zeros(n, dtype=np.int64)
+        self.player_cooldown = np.zeros(n, dtype=np.float64)
+        self.gksr_hp = np.zeros(n, dtype=np.int64)
+        self.gksr_phase = np.zeros(n, dtype=np.int64)
+        self.gksr_cooldown = np.zeros(n, dtype=np.float64)
+        self.waves = np.zeros(n, dtype=np.uint64)
+        self.time_left = np.zeros(n, dtype=np.float64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+
+        self.player_shot_x = np.zeros((n, self.player_slots), dtype=np.float32)
+        self.player_shot_y = np.zeros((n, self.player_slots), dtype=np.float32)
+        self.player_shot_alive = np.zeros((n, self.player_slots), dtype=bool)
+        self.player_shot_head = np.zeros(n, dtype=np.int64)
+
+        self.gksr_shot_x = np.zeros((n, self.lane_slots, GKSR_ORIGINS), dtype=np.float32)
+        self.gksr_shot_alive = np.zeros((n, self.lane_slots, GKSR_ORIGINS), dtype=bool)
+        self.gksr_shot_head = np.zeros((n, GKSR_ORIGINS), dtype=np.int64)
+        self.distances = np.zeros((n, GKSR_ORIGINS), dtype=np.float32)
+
+        self.game_end_scenario = np.zeros(n, dtype=np.int64)
+        self.last_game_end_scenario = np.zeros(n, dtype=np.int64)
+        self.last_ticks = np.zeros(n, dtype=np.int64)
+        self.episodes = 0
+        self.reset()
+
+    def reset(self, seeds=None):
+        seeds = np.arange(self.num_envs) if seeds is None else np.asarray(seeds)
+        self.episode_index[:] = 0
+        self._reset_envs(np.arange(self.num_envs), seeds.astype(np.uint64))
+        self.episodes = 0
+        return self.observe()
+
+    def _reset_envs(self, indices, seeds):
+        self.seeds[indices] = seeds
+        self.player_y[indices] = PLAYER_POSITION[1]
+        self.player_hp[indices] = self.balance['player_hitpoints']
+        self.player_cooldown[indices] = 0.0
+        self.gksr_hp[indices] = self.balance['gksr_hitpoints']
+        self.gksr_phase[indices] = 0
+        self.gksr_cooldown[indices] = 0.0
+        self.waves[indices] = 0
+        self.time_left[indices] = self.time_limit
+        self.ticks[indices] = 0
+
+        self.player_shot_alive[indices] = False
+        self.player_shot_head[indices] = 0
+        self.gksr_shot_alive[indices] = False
+        self.gksr_shot_head[indices] = 0
+        self.game_end_scenario[indices] = 0
+
+    def _update_player(self, actions):
+        dt = self.dt
+        direction = (actions == 2).astype(np.float64) - (actions == 1)
+        cooling = self.player_cooldown <= self.balance['player_shoot_cooldown_time']
+        self.player_cooldown[cooling] += dt
+
+        projected_y = np.floor(self.player_y + (direction * (self.balance['player_speed'] * dt)) + 0.5)
+        inside = (projected_y - (PLAYER_HITBOX[1] / 2) > PLAYER_LIMITS[0]) & (projected_y + (PLAYER_HITBOX[1] / 2) < PLAYER_LIMITS[1])
+        np.copyto(self.player_y, projected_y, where=inside)
+
+        shooting = np.flatnonzero((actions == 3) & (self.player_cooldown >= self.balance['player_shoot_cooldown_time']))
+        slots = self.player_shot_head[shooting]
+        if self.player_shot_alive[shooting, slots].any():
+            raise RuntimeError('player projectile ring overflowed; raise the slot count for this balance')
+        self.player_shot_x[shooting, slots] = PLAYER_POSITION[0]
+        self.player_shot_y[shooting, slots] = self.player_y[shooting]
+        self.player_shot_alive[shooting, slots] = True
+        self.player_shot_head[shooting] = (slots + 1) % self.player_slots
+        self.player_cooldown[shooting] = 0.0
+
+    def _update_gksr(self):
+        cooldowns = self.phase_cooldowns[self.gksr_phase]
+        cooling = self.gksr_cooldown <= cooldowns
+        self.gksr_cooldown[cooling] += self.dt
+
+        next_threshold = self.phase_thresholds[self.gksr_phase + 1]
+        self.gksr_phase += (self.gksr_hp / self.balance['gksr_hitpoints']) < next_threshold
+
+        firing = np.flatnonzero(self.gksr_cooldown >= self.phase_cooldowns[self.gksr_phase])
+        if len(firing) == 0:
+            return
+
+        counters = (self.episode_index[firing] << np.uint64(32)) | self.waves[firing]
+        draws = _hash_uniform(self.seeds[firing, None], counters[:, None], self.lane_ids[None, :])
+        order = draws.argsort(axis=1)
+        ranks = np.empty_like(order)
+        np.put_along_axis(ranks, order, np.arange(GKSR_ORIGINS)[None, :], axis=1)
+        chosen = ranks < self.phase_wave_sizes[self.gksr_phase[firing], None]
+
+        rows, lanes = np.nonzero(chosen)
+        envs = firing[rows]
+        slots = self.gksr_shot_head[envs, lanes]
+        if self.gksr_shot_alive[envs, slots, lanes].any():
+            raise RuntimeError('G.K.S.R. lane ring overflowed; raise the slot count for this balance')
+        self.gksr_shot_x[envs, slots, lanes] = GKSR_ORIGIN_X
+        self.gksr_shot_alive[envs, slots, lanes] = True
+        self.gksr_shot_head[envs, lanes] = (slots + 1) % self.lane_slots
+
+        self.waves[firing] += np.uint64(1)
+        self.gksr_cooldown[firing] = 0.0
+
+    def _update_player_projectiles(self):
+        travel = PLAYER_PROJECTILE_SPEED * self.dt
+        self.player_shot_x += travel
+        self.player_shot_alive &= self.player_shot_x - (PROJECTILE_DRAW_SIZE / 2) < project.DISPLAY_WIDTH
+
+        half_w = PLAYER_PROJECTILE_HITBOX[0] / 2
+        hits = self.player_shot_alive & (self.player_shot_x + half_w > GKSR_POSITION[0] - (GKSR_HITBOX[0] / 2))
+        hits &= self.player_shot_x - (travel + half_w) < GKSR_POSITION[0] + (GKSR_HITBOX[0] / 2)
+        hits &= np.abs(self.player_shot_y - GKSR_POSITION[1]) < (GKSR_HITBOX[1] + PLAYER_PROJECTILE_HITBOX[1]) / 2
+        if not hits.any():
+            return 0
+
+        hit_counts = np.count_nonzero(hits, axis=1)
+        self.player_shot_alive &= ~hits
+        self.gksr_hp -= hit_counts
+        return hit_counts
+
+    def _update_gksr_projectiles(self):
+        travel = GKSR_PROJECTILE_SPEED * self.dt
+        self.gksr_shot_x -= travel
+        self.gksr_shot_alive &= self.gksr_shot_x + (PROJECTILE_DRAW_SIZE / 2) > 0
+
+        half_w = GKSR_PROJECTILE_HITBOX[0] / 2
+        lanes = np.abs(self.lane_y[None, :] - self.player_y[:, None]) < (PLAYER_HITBOX[1] + GKSR_PROJECTILE_HITBOX[1]) / 2
+        hits = self.gksr_shot_alive & (self.gksr_shot_x - half_w < PLAYER_POSITION[0] + (PLAYER_HITBOX[0] / 2))
+        hits &= self.gksr_shot_x + (travel + half_w) > PLAYER_POSITION[0] - (PLAYER_HITBOX[0] / 2)
+        hits &= lanes[:, None, :]
+        if not hits.any():
+            return 0
+
+        hit_counts = np.count_nonzero(hits.reshape(self.num_envs, -1), axis=1)
+        self.gksr_shot_alive &= ~hits
+        self.player_hp -= hit_counts
+        return hit_counts
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        self._update_player(actions)
+        self._update_gksr()
+        hits_dealt = self._update_player_projectiles()
+        hits_taken = self._update_gksr_projectiles()
+
+        self.time_left -= self.dt
+        self.ticks += 1
+
+        scenario = self.game_end_scenario
+        scenario[:] = 0
+        scenario[self.time_left <= 0] = 3
+        scenario[self.player_hp <= 0] = 2
+        scenario[self.gksr_hp <= 0] = 1
+        dones = scenario != 0
+
+        rewards = (hits_dealt * VECTOR_REWARDS['hit']) + (hits_taken * VECTOR_REWARDS['hurt'])
+        rewards += (scenario == 1) * VECTOR_REWARDS['win']
+        rewards += (scenario == 2) * VECTOR_REWARDS['lose']
+
+        finished = np.flatnonzero(dones)
+        if len(finished) > 0:
+            self.last_game_end_scenario[finished] = scenario[finished]
+            self.last_ticks[finished] = self.ticks[finished]
+            self.episodes += len(finished)
+            if self.auto_reset:
+                self.episode_index[finished] += np.uint64(1)
+                self._reset_envs(finished, self.seeds[finished])
+        return (self.observe(), rewards, dones)
+
+    def observe(self):
+        distances = self.distances
+        distances[:] = project.DISPLAY_WIDTH
+        passed_x = PLAYER_POSITION[0] - ((PLAYER_HITBOX[0] + GKSR_PROJECTILE_HITBOX[0]) / 2)
+        for slot in range(0, self.lane_slots, 1):
+            incoming = self.gksr_shot_alive[:, slot] & (self.gksr_shot_x[:, slot] > passed_x)
+            np.minimum(distances, self.gksr_shot_x[:, slot], out=distances, where=incoming)
+        distances -= PLAYER_POSITION[0]
+
+        observations = np.empty((self.num_envs, self.observation_size), dtype=np.float32)
+        observations[:, 0] = self.player_y / project.DISPLAY_HEIGHT
+        observations[:, 1] = self.player_hp / self.balance['player_hitpoints']
+        observations[:, 2] = self.player_cooldown >= self.balance['player_shoot_cooldown_time']
+        observations[:, 3] = self.gksr_hp / self.balance['gksr_hitpoints']
+        observations[:, 4] = self.gksr_phase / max(len(self.phase_cooldowns) - 1, 1)
+        observations[:, 5] = self.time_left / self.time_limit
+        observations[:, 6:] = distances / project.DISPLAY_WIDTH
+        return observations
+
+def measure_throughput(n=4096, steps=1000, seed=0):
+    env = VectorEnv(n)
+    env.reset(np.arange(n) + seed)
+    actions = np.random.default_rng(seed).integers(0, len(VECTOR_ACTIONS), (steps, n))
+
+    start = time.perf_counter()
+    for tick in range(0, steps, 1):
+        env.step(actions[tick])
+    elapsed = time.perf_counter() - start
+    return {
+        'envs': n,
+        'steps': steps,
+        'seconds': elapsed,
+        'env_steps_per_second': (n * steps) / elapsed,
+        'episodes': env.episodes,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Step many headless boss fights at once with random actions and report throughput.')
+    parser.add_argument('--envs', type=int, default=4096, help='fights stepped together')
+    parser.add_argument('--steps', type=int, default=1000, help='steps per fight')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first fight')
+    args = parser.parse_args(argv)
+
+    json.dump(measure_throughput(args.envs, args.steps, args.seed), sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+SOURCE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+@pytest.fixture(scope='session', autouse=True)
+def headless():
+    import project
+
+    working_directory = os.getcwd()
+    os.chdir(SOURCE_DIRECTORY)
+    project.init_headless()
+    yield
+    os.chdir(working_directory)
@@ -0,0 +1,32 @@
+import random
+
+import pygame
+
+import project
+
+def make_world(mode, count=400, seed=0):
+    world = project.GameWorld(star_count=0, rng=random.Random(seed), collision_mode=mode)
+    rng = random.Random(seed)
+    blast_details = (('images\\player\\blast\\', 6, 12), (0, 0), (1, 1))
+    for projectile in range(0, count, 1):
+        position = (rng.uniform(1300, 1850), rng.uniform(0, project.DISPLAY_HEIGHT))
+        world.player_projectiles.spawn(('images\\player\\projectile\\', 3, 12), position, hb=(20, 20), s=900, dir=1, dmg=1, bd=blast_details)
+    return world
+
+def test_grid_matches_brute_force():
+    world = make_world('rect')
+    pool = world.player_projectiles
+    targets = [pygame.Rect(x, y, 300, 300) for x in range(1300, 1900, 150) for y in range(0, 1080, 270)]
+    for grid in (project.CollisionGrid(), project.CollisionGrid(me=0, mq=0)):
+        grid.begin_frame()
+        grid.register_pool(pool)
+        for rect in targets:
+            assert grid.query(pool, rect).tolist() == sorted(pool.find_hits(rect).tolist())
+
+def test_mask_hits_are_a_subset_of_rect_hits():
+    rect_world = make_world('rect')
+    rect_hits = set(project.find_projectile_hits(rect_world.player_projectiles, rect_world.gksr).tolist())
+    mask_world = make_world('mask')
+    mask_hits = set(project.find_projectile_hits(mask_world.player_projectiles, mask_world.gksr).tolist())
+    assert len(rect_hits) > 0
+    assert mask_hits <= rect_hits
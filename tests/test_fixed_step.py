@@ -0,0 +1,14 @@
+import pytest
+
+import project
+
+def test_steps_follow_elapsed_time():
+    stepper = project.FixedStepper()
+    steps = sum(stepper.advance(0.016) for frame in range(0, 100, 1))
+    assert abs(steps - 192) <= 1
+    assert 0.0 <= stepper.alpha < 1.0
+
+def test_long_stalls_drop_time():
+    stepper = project.FixedStepper()
+    assert stepper.advance(1.0) == project.MAX_CATCH_UP_STEPS
+    assert stepper.dropped_time == pytest.approx(1.0 - (project.MAX_CATCH_UP_STEPS * project.SIMULATION_STEP), abs=project.SIMULATION_STEP)
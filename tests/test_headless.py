@@ -0,0 +1,16 @@
+import project
+
+def run_stats(seed):
+    stats = project.run_headless_simulation(seed=seed)
+    return (stats['ticks'], stats['gksr_hitpoints'], stats['hits_taken'], stats['player_hitpoints'])
+
+def test_seeded_runs_do_not_depend_on_earlier_runs():
+    first = run_stats(0)
+    run_stats(1)
+    project.ANIMATION_CLOCK.reset(0.05)
+    assert run_stats(0) == first
+
+def test_cut_off_runs_have_no_winner():
+    stats = project.run_headless_simulation(seed=0, max_ticks=120)
+    assert stats['game_end_scenario'] == 0
+    assert stats['winner'] is None
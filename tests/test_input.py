@@ -0,0 +1,30 @@
+import pygame
+
+import project
+
+def post_key(event_type, key, **attributes):
+    pygame.event.post(pygame.event.Event(event_type, key=key, **attributes))
+
+def test_taps_reach_the_next_step():
+    pygame.event.clear()
+    queue = project.InputQueue()
+    post_key(pygame.KEYDOWN, pygame.K_SPACE)
+    post_key(pygame.KEYUP, pygame.K_SPACE)
+    queue.poll()
+
+    assert queue.next_state()[pygame.K_SPACE]
+    assert not queue.next_state()[pygame.K_SPACE]
+    assert len(queue.take_applied()) == 2
+
+def test_sdl_timestamps_are_used_when_present():
+    pygame.event.clear()
+    queue = project.InputQueue()
+    post_key(pygame.KEYDOWN, pygame.K_UP)
+    queue.poll()
+    assert queue.stamp_source == 'poll'
+
+    post_key(pygame.KEYDOWN, pygame.K_DOWN, timestamp=pygame.time.get_ticks() - 50)
+    before = project.time.perf_counter()
+    queue.poll()
+    assert queue.stamp_source == 'event'
+    assert queue.queued[-1][0] < before - 0.04
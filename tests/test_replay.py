@@ -0,0 +1,38 @@
+import project
+
+def record_fight(world, seed, max_ticks=None):
+    world.reset(seed)
+    log = project.ReplayLog(seed, len(world.stars.pos_x), world.time_limit, None, project.SIMULATION_STEP)
+    while world.game_end_scenario == 0 and (max_ticks is None or world.ticks < max_ticks):
+        world.step(log.record(project.dodging_bot(world)), project.SIMULATION_STEP)
+    log.finish(world)
+    return log
+
+def test_replays_every_fight_recorded_in_one_session():
+    world = project.GameWorld()
+    logs = [record_fight(world, 11), record_fight(world, 22, max_ticks=600), record_fight(world, 33)]
+
+    for log in logs:
+        replayer = project.Replayer(log)
+        replayer.run()
+        assert replayer.matches_recording()
+
+def test_seek_does_not_depend_on_history():
+    log = record_fight(project.GameWorld(), 33)
+
+    replayer = project.Replayer(log)
+    replayer.run()
+    replayer.seek(300)
+
+    fresh = project.Replayer(log)
+    fresh.seek(300)
+    assert replayer.world.state_hash() == fresh.world.state_hash()
+
+def test_saved_log_round_trips(tmp_path):
+    log = record_fight(project.GameWorld(), 5, max_ticks=600)
+    path = str(tmp_path / 'fight.bin')
+    log.save(path)
+
+    replayer = project.Replayer(project.ReplayLog.load(path))
+    replayer.run()
+    assert replayer.matches_recording()
@@ -0,0 +1,57 @@
+import random
+
+import project
+
+def advance(world, ticks):
+    for tick in range(0, ticks, 1):
+        world.step(project.dodging_bot(world), project.SIMULATION_STEP)
+
+def test_restore_reproduces_the_snapshot():
+    world = project.GameWorld(rng=random.Random(3))
+    advance(world, 900)
+    snapshot = world.snapshot()
+
+    restored = project.GameWorld(rng=random.Random(4))
+    restored.restore(snapshot)
+    assert restored.state_hash() == world.state_hash()
+
+def test_restored_world_continues_identically(tmp_path):
+    world = project.GameWorld(rng=random.Random(3))
+    advance(world, 900)
+    path = str(tmp_path / 'snapshot.json')
+    project.save_snapshot(world.snapshot(), path)
+    advance(world, 600)
+    expected = world.state_hash()
+
+    restored = project.GameWorld(rng=random.Random(4))
+    restored.restore(project.load_snapshot(path))
+    advance(restored, 600)
+    assert restored.state_hash() == expected
+
+def test_reset_reuses_projectile_buffers():
+    world = project.GameWorld(rng=random.Random(3))
+    advance(world, 900)
+    pool = world.gksr_projectiles
+    buffers = (pool.pos_x, pool.alive, pool.kinds)
+
+    world.reset(5)
+    assert len(pool) == 0
+    assert all(new is old for new, old in zip((pool.pos_x, pool.alive, pool.kinds), buffers))
+    assert world.state_hash() == project.GameWorld(rng=random.Random(5)).state_hash()
+
+def test_projectile_state_does_not_depend_on_capacity():
+    details = ('images\\gksr\\phase1\\projectile\\', 3, 12)
+    blast_details = (('images\\gksr\\phase1\\blast\\', 8, 12), (0, 0), (1, 1))
+    pools = (project.ProjectilePool(cap=4), project.ProjectilePool(cap=64))
+    for pool in pools:
+        pool._get_kind_id(('images\\player\\projectile\\', 3, 12), (20, 20), blast_details)
+        for projectile in range(0, 10, 1):
+            pool.spawn(details, (100 * projectile, 50), hb=(48, 48), s=750, dir=-1, dmg=1, bd=blast_details)
+        pool.release([2, 5, 7])
+    assert pools[0].get_state() == pools[1].get_state()
+
+    restored = project.ProjectilePool(cap=4)
+    restored.set_state(pools[1].get_state())
+    for pool in (pools[0], restored):
+        pool.spawn(details, (0, 0), hb=(48, 48), s=750, dir=-1, dmg=1, bd=blast_details)
+    assert restored.get_state() == pools[0].get_state()
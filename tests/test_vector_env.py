@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+import pygame
+
+import project
+import vector_env
+
+ACTION_KEYS = (project.KeyState(), project.KeyState((pygame.K_UP,)), project.KeyState((pygame.K_DOWN,)), project.KeyState((pygame.K_SPACE,)))
+
+def scripted_actions(ticks):
+    return [3 if tick % 90 < 60 else 1 + ((tick // 90) % 2) for tick in range(0, ticks, 1)]
+
+def test_matches_game_world_in_rect_mode():
+    world = project.GameWorld(star_count=0, rng=random.Random(0), collision_mode='rect')
+    env = vector_env.VectorEnv(1, auto_reset=False)
+    env.reset([0])
+
+    for tick, action in enumerate(scripted_actions(6000)):
+        world.step(ACTION_KEYS[action], project.SIMULATION_STEP)
+        env.step(np.array([action]))
+        if world.game_end_scenario != 0 or env.game_end_scenario[0] != 0:
+            break
+        assert env.player_y[0] == world.player.pos_y, tick
+        assert env.gksr_hp[0] == world.gksr.hitpoints, tick
+    assert tick > 600
+
+def test_fights_do_not_depend_on_batch_size():
+    actions = np.array(scripted_actions(2000))
+    single = vector_env.VectorEnv(1)
+    single.reset([7])
+    batch = vector_env.VectorEnv(16)
+    batch.reset(np.arange(16) + 7)
+
+    for action in actions:
+        single_observation = single.step(np.array([action]))[0]
+        batch_observation = batch.step(np.full(16, action))[0]
+        assert np.array_equal(single_observation[0], batch_observation[0])
+
+def test_short_cooldowns_do_not_overwrite_live_projectiles():
+    balance = {'player_shoot_cooldown_time': 0.0, 'gksr_attack_phases': {'1': {'cooldown_time': 0.0}}}
+    env = vector_env.VectorEnv(8, balance=balance)
+    env.reset()
+    live = 0
+    for tick in range(0, 600, 1):
+        env.step(np.full(8, 3))
+        live = max(live, int(env.player_shot_alive.sum(axis=1).max()))
+    assert live > 100
+
+def test_steps_before_reset_start_fresh_fights():
+    env = vector_env.VectorEnv(4)
+    observations, rewards, dones = env.step(np.zeros(4, dtype=np.int64))
+    assert not dones.any()
+    assert (rewards == 0).all()
+    assert (env.gksr_hp == env.balance['gksr_hitpoints']).all()